@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+'''
+micro-benchmark for the daily stats row builder
+compares build_daily_rows against the original per-day linear scan of the views and clones lists
+
+    python bench/bench_daily_rows.py -r 1500 -d 14 -d 90 -d 365
+'''
+
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from git_metrics.pipeline import build_daily_rows  # noqa: E402
+
+
+def synthetic_traffic(type, days, stop_date):
+    '''
+    generate a traffic response with an entry for every other day
+    :param type: views or clones
+    :param days: number of days of traffic
+    :param stop_date: datetime of the newest day
+    :return: traffic response dict
+    '''
+
+    items = []
+    for day in range(days, 0, -1):
+        if day % 2:
+            timestamp = (stop_date - timedelta(days=day)).strftime('%Y-%m-%dT00:00:00Z')
+            items.append({'timestamp': timestamp, 'count': day, 'uniques': 1})
+
+    return {'count': len(items), 'uniques': len(items), type: items}
+
+
+def linear_scan_rows(org, repo, repo_traffic_views, repo_traffic_clones, start_date, stop_date):
+    '''
+    original daily loop that scans the views and clones lists for every day
+    '''
+
+    stats_dict = {'metrics.github.org': org, 'metrics.github.repo': repo}
+    item_date = start_date
+
+    while item_date < stop_date:
+        stats_dict['date'] = item_date.strftime('%Y-%m-%dT00:00:00Z')
+
+        for type, traffic in [('views', repo_traffic_views), ('clones', repo_traffic_clones)]:
+            date_pos = next((index for (index, d) in enumerate(traffic[type]) if
+                             d["timestamp"] == stats_dict['date']), None)
+            if date_pos is not None:
+                stats_dict[f'metrics.github.{type}.daily.count'] = traffic[type][date_pos]['count']
+                stats_dict[f'metrics.github.{type}.daily.uniques'] = traffic[type][date_pos]['uniques']
+            else:
+                stats_dict[f'metrics.github.{type}.daily.count'] = 0
+                stats_dict[f'metrics.github.{type}.daily.uniques'] = 0
+
+        yield dict(stats_dict)
+        item_date = item_date + timedelta(days=1)
+
+
+@click.command()
+@click.option("-r", "--repos", help="number of repos per run", type=int, default=1500)
+@click.option("-d", "--days_ago", help="look back num days, repeat for several windows", type=int,
+              multiple=True, default=[14, 90, 365])
+@click.option("-n", "--number", help="timed runs per measurement, best run is reported", type=int, default=3)
+def cli(repos, days_ago, number):
+    """
+    time both row builders over a synthetic repo list for each look back window
+    :param repos: number of repos per run
+    :param days_ago: look back windows in days
+    :param number: timed runs per measurement
+    :return: None
+    """
+
+    stop_date = datetime.now() - timedelta(minutes=1)
+
+    print(f'{"days":>6} {"repos":>6} {"linear scan":>14} {"indexed":>14} {"per repo":>12} {"speedup":>8}')
+    for days in days_ago:
+        views = synthetic_traffic('views', days, stop_date)
+        clones = synthetic_traffic('clones', days, stop_date)
+        start_date = stop_date - timedelta(days=days)
+
+        def run(builder):
+            for repo in range(repos):
+                for _ in builder('org', f'repo{repo}', views, clones, start_date, stop_date):
+                    pass
+
+        linear = min(timeit.repeat(lambda: run(linear_scan_rows), number=1, repeat=number))
+        indexed = min(timeit.repeat(lambda: run(build_daily_rows), number=1, repeat=number))
+
+        print(f'{days:>6} {repos:>6} {linear:>13.3f}s {indexed:>13.3f}s '
+              f'{indexed / repos * 1e6:>10.1f}us {linear / indexed:>7.1f}x')
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+'''
+end to end benchmark of the json command against the local github stub
+for each repo list size a stub server is started, the json command runs in a fresh interpreter
+against a synthetic repo list, and wall time, throughput, and peak memory are reported
+each size runs twice by default, first with a cold response cache and then with a warm one
+so both the 200 and the 304 paths are measured
+with --load the documents are also bulk loaded to bench/elastic_stub.py, which can reject
+documents with 429 or a mapping error and send malformed responses
+
+    python bench/bench_end_to_end.py -r 10 -r 100 -r 10000 -w 16 --latency 0.02
+    python bench/bench_end_to_end.py -r 100 --load --load_reject_rate 0.2 --load_malformed_rate 0.05
+'''
+
+import glob
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCH, '..')
+
+# runs the json command in a fresh interpreter and reports its peak memory on stderr
+# retry backoff is disabled so injected errors measure the retry path instead of sleeping
+CHILD = '''
+import json, resource, sys
+from git_metrics import conf
+conf.github_api_url = sys.argv[1]
+conf.github_backoff_factor = 0
+conf.elastic_url_port = sys.argv[2]
+conf.elastic_backoff_factor = 0
+from git_metrics.json_out import cli
+try:
+    cli(sys.argv[3:], standalone_mode=False)
+finally:
+    print(json.dumps({'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}), file=sys.stderr)
+'''
+
+
+def free_port():
+    '''
+    :return: a local port that is free to listen on
+    '''
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_stub(port, latency, not_modified, error_rate, rate_limit, rate_window):
+    '''
+    start bench/github_stub.py in a subprocess and wait until it is listening
+    :return: stub process
+    '''
+
+    stub = subprocess.Popen([sys.executable, os.path.join(BENCH, 'github_stub.py'), '-p', str(port),
+                             '--latency', str(latency), '--not_modified', str(not_modified),
+                             '--error_rate', str(error_rate), '--rate_limit', str(rate_limit),
+                             '--rate_window', str(rate_window)],
+                            stdout=subprocess.PIPE, text=True)
+    # the stub prints one line once the socket is bound
+    stub.stdout.readline()
+
+    return stub
+
+
+def write_repo_list(work_dir, repos):
+    '''
+    :param work_dir: directory of the benchmark run
+    :param repos: number of repos
+    :return: repo list file name
+    '''
+
+    filename = os.path.join(work_dir, 'repos.csv')
+    with open(filename, 'w') as f:
+        for i in range(repos):
+            f.write(f'bench-org,repo-{i:05d}\n')
+
+    return filename
+
+
+def start_elastic_stub(port, reject_rate, error_rate, malformed_rate):
+    '''
+    start bench/elastic_stub.py in a subprocess and wait until it is listening
+    :return: stub process
+    '''
+
+    stub = subprocess.Popen([sys.executable, os.path.join(BENCH, 'elastic_stub.py'), '-p', str(port),
+                             '--reject_rate', str(reject_rate), '--error_rate', str(error_rate),
+                             '--malformed_rate', str(malformed_rate)],
+                            stdout=subprocess.PIPE, text=True)
+    stub.stdout.readline()
+
+    return stub
+
+
+def run_json(work_dir, api_url, elastic_url_port, workers, no_cache, enrich, load):
+    '''
+    run the json command once in work_dir
+    :return: dict of wall seconds, peak rss kb, and the command's run summary
+    '''
+
+    args = ['-a', 'bench', '-f', 'repos.csv', '-w', str(workers), '--full',
+            '--state_db', 'state.db', '--history_db', 'history.db', '--cache_dir', 'cache']
+    if no_cache:
+        args.append('--no_cache')
+    if enrich:
+        args.append('--enrich')
+    if load:
+        args.append('--load')
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD, api_url, elastic_url_port] + args, cwd=work_dir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+
+    # documents the elasticsearch stub rejects fail the load, which exits with status 1
+    if result.returncode != 0 and not (load and result.returncode == 1):
+        raise click.ClickException(f'json command failed:\n{result.stderr}')
+
+    # the json command's run summary is the newest file in metrics_output
+    summary_filename = sorted(glob.glob(os.path.join(work_dir, 'metrics_output', 'run-*.json')))[-1]
+    with open(summary_filename) as f:
+        summary = json.load(f)
+    os.remove(summary_filename)
+
+    return {'wall': wall, 'max_rss_kb': json.loads(result.stderr.splitlines()[-1])['max_rss_kb'],
+            'summary': summary}
+
+
+def counter_total(summary, name, **labels):
+    '''
+    :param summary: run summary dict
+    :param name: counter name
+    :param labels: only count counters with these label values
+    :return: counter value summed over all other labels
+    '''
+
+    return sum(counter['value'] for counter in summary['counters']
+               if counter['name'] == name and labels.items() <= counter['labels'].items())
+
+
+@click.command()
+@click.option("-r", "--repos", help="repo list size, repeat for several sizes", type=int, multiple=True,
+              default=[10, 100, 10000])
+@click.option("-w", "--workers", help="number of repos to fetch concurrently", type=int, default=16)
+@click.option("--runs", help="runs per size, the first with a cold cache", type=int, default=2)
+@click.option("--latency", help="stub reply latency in seconds", type=float, default=0.0)
+@click.option("--not_modified", help="fraction of conditional requests answered with 304", type=float, default=1.0)
+@click.option("--error_rate", help="fraction of requests answered with a 500 error", type=float, default=0.0)
+@click.option("--rate_limit", help="stub requests per rate window", type=int, default=1000000)
+@click.option("--rate_window", help="seconds until the stub rate limit resets", type=int, default=5)
+@click.option("--no_cache", help="run the json command without the response cache", is_flag=True)
+@click.option("--enrich", help="run the json command with graphql repo metadata enrichment", is_flag=True)
+@click.option("--load", help="also bulk load the documents to the elasticsearch stub", is_flag=True)
+@click.option("--load_reject_rate", help="fraction of documents the elasticsearch stub rejects with 429", type=float,
+              default=0.0)
+@click.option("--load_error_rate", help="fraction of documents the elasticsearch stub fails with a mapping error",
+              type=float, default=0.0)
+@click.option("--load_malformed_rate", help="fraction of bulk requests answered with a malformed body", type=float,
+              default=0.0)
+@click.option("-o", "--output", help="also write the results as json to compare runs", type=str, default='')
+def cli(repos, workers, runs, latency, not_modified, error_rate, rate_limit, rate_window, no_cache, enrich, load,
+        load_reject_rate, load_error_rate, load_malformed_rate, output):
+    """
+    run the json command end to end against the github stub
+    :param repos: repo list sizes
+    :param workers: concurrent repos
+    :param runs: runs per size
+    :param latency: stub reply latency
+    :param not_modified: fraction of 304 replies
+    :param error_rate: fraction of 500 replies
+    :param rate_limit: stub rate limit
+    :param rate_window: stub rate limit window in seconds
+    :param no_cache: disable the response cache
+    :param enrich: enable repo metadata enrichment
+    :param load: enable bulk loading to the elasticsearch stub
+    :param load_reject_rate: fraction of documents rejected with 429
+    :param load_error_rate: fraction of documents failed with a mapping error
+    :param load_malformed_rate: fraction of malformed bulk responses
+    :param output: results json file
+    :return: None
+    """
+
+    results = []
+    print(f'{"repos":>6} {"run":>4} {"wall":>8} {"repos/s":>9} {"docs/s":>9} {"requests":>9} {"retries":>8} '
+          f'{"limit wait":>10} {"MB written":>10} {"peak MB":>8}' +
+          (f' {"loaded":>9} {"load errors":>11}' if load else ''))
+
+    for repo_count in repos:
+        work_dir = tempfile.mkdtemp(prefix='git_metrics_bench_')
+        port = free_port()
+        stub = start_stub(port, latency, not_modified, error_rate, rate_limit, rate_window)
+        elastic_port = free_port()
+        elastic_stub = start_elastic_stub(elastic_port, load_reject_rate, load_error_rate, load_malformed_rate) \
+            if load else None
+        try:
+            write_repo_list(work_dir, repo_count)
+            for output_dir in ['daily_output', 'referrer_output']:
+                os.makedirs(os.path.join(work_dir, output_dir))
+
+            for run in range(runs):
+                result = run_json(work_dir, f'http://127.0.0.1:{port}', f'127.0.0.1:{elastic_port}', workers,
+                                  no_cache, enrich, load)
+                summary = result['summary']
+                documents = counter_total(summary, 'documents')
+                row = {
+                    'repos': repo_count,
+                    'run': 'cold' if run == 0 else 'warm',
+                    'wall_seconds': round(result['wall'], 3),
+                    'repos_per_second': round(repo_count / result['wall'], 1),
+                    'documents_per_second': round(documents / result['wall'], 1),
+                    'requests': counter_total(summary, 'github_requests'),
+                    'retries': counter_total(summary, 'github_retries'),
+                    'rate_limit_wait_seconds': round(counter_total(summary, 'github_rate_limit_wait_seconds'), 3),
+                    'bytes_written': counter_total(summary, 'bytes_written'),
+                    'peak_rss_mb': round(result['max_rss_kb'] / 1024, 1),
+                }
+                if load:
+                    row['documents_loaded'] = counter_total(summary, 'elastic_documents', status='loaded')
+                    row['documents_load_errors'] = counter_total(summary, 'elastic_documents', status='error')
+                results.append(row)
+
+                print(f'{row["repos"]:>6} {row["run"]:>4} {row["wall_seconds"]:>7.2f}s '
+                      f'{row["repos_per_second"]:>9.1f} {row["documents_per_second"]:>9.1f} {row["requests"]:>9} '
+                      f'{row["retries"]:>8} {row["rate_limit_wait_seconds"]:>9.2f}s '
+                      f'{row["bytes_written"] / 1024 / 1024:>10.1f} {row["peak_rss_mb"]:>8.1f}' +
+                      (f' {row["documents_loaded"]:>9} {row["documents_load_errors"]:>11}' if load else ''))
+        finally:
+            for process in [stub, elastic_stub]:
+                if process is not None:
+                    process.terminate()
+                    process.wait()
+            shutil.rmtree(work_dir)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    cli()
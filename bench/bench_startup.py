@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+'''
+startup benchmark for the git_metrics command line
+runs each command in a fresh interpreter with -X importtime and reports wall time, total import
+time, and the heaviest top level imports
+
+    python bench/bench_startup.py -n 10
+'''
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# name -> interpreter arguments
+# the eager case imports every sub-command module up front, the way each script used to
+CASES = [
+    ('group --help', ['-m', 'git_metrics', '--help']),
+    ('quick --help', ['-m', 'git_metrics', 'quick', '--help']),
+    ('json --help', ['-m', 'git_metrics', 'json', '--help']),
+    ('eager imports', ['-c', 'import git_metrics.json_out, git_metrics.quick, git_metrics.csv_out, '
+                             'git_metrics.history']),
+]
+
+
+def run_importtime(args):
+    '''
+    run the interpreter once with -X importtime
+    :param args: interpreter arguments
+    :return: tuple of (wall time seconds, dict of top level module to cumulative import us)
+    '''
+
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented under the module that imported them
+        if not name[1:].startswith(' '):
+            top_level[name.strip()] = int(cumulative)
+
+    return wall, top_level
+
+
+@click.command()
+@click.option("-n", "--number", help="runs per command, the median is reported", type=int, default=10)
+@click.option("-t", "--top", help="heaviest top level imports to list per command", type=int, default=3)
+def cli(number, top):
+    """
+    time interpreter startup for each command
+    :param number: runs per command
+    :param top: heaviest imports to list
+    :return: None
+    """
+
+    print(f'{"command":<16} {"wall":>9} {"imports":>9}  heaviest imports')
+    for name, args in CASES:
+        runs = [run_importtime(args) for _ in range(number)]
+        wall = statistics.median(run[0] for run in runs)
+        imports = statistics.median(sum(run[1].values()) for run in runs)
+        heaviest = sorted(runs[-1][1].items(), key=lambda item: item[1], reverse=True)[:top]
+
+        print(f'{name:<16} {wall * 1000:>7.1f}ms {imports / 1000:>7.1f}ms  '
+              + ', '.join(f'{module} {us / 1000:.1f}ms' for module, us in heaviest))
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+'''
+local stand-in for the elasticsearch _bulk api used by the benchmarks
+documents are not stored, but like elasticsearch's dynamic mapping the dotted field names of each
+index are expanded and a document is rejected with a mapping error when a field would have to be both
+an object and a value, such as metrics.github.repo and metrics.github.repo.url
+a share of documents can also be rejected with 429 or a mapping error, and a share of requests
+answered with a 200 body that is not a bulk response
+
+    python bench/elastic_stub.py -p 9201 --reject_rate 0.1 --error_rate 0.01 --malformed_rate 0.01
+'''
+
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+
+REJECTED = {'type': 'es_rejected_execution_exception', 'reason': 'rejected execution of bulk item'}
+MAPPING_ERROR = {'type': 'mapper_parsing_exception', 'reason': 'failed to parse document'}
+
+
+def field_kinds(document, prefix=''):
+    '''
+    expand dotted field names the way elasticsearch's dynamic mapping does
+    :param document: json document
+    :param prefix: path of the enclosing object
+    :return: list of (field path, 'object' or 'value') in document order
+    '''
+
+    kinds = []
+    for name, value in document.items():
+        path = prefix
+        for part in name.split('.')[:-1]:
+            path = f'{path}{part}'
+            kinds.append((path, 'object'))
+            path = f'{path}.'
+        path = f'{path}{name.split(".")[-1]}'
+        if isinstance(value, dict):
+            kinds.append((path, 'object'))
+            kinds.extend(field_kinds(value, f'{path}.'))
+        else:
+            kinds.append((path, 'value'))
+
+    return kinds
+
+
+class StubSettings:
+    '''
+    behaviour of the stub server shared by all request handler threads
+    '''
+
+    def __init__(self, reject_rate=0.0, error_rate=0.0, malformed_rate=0.0, seed=0):
+        '''
+        :param reject_rate: fraction of documents rejected with 429
+        :param error_rate: fraction of documents rejected with a 400 mapping error
+        :param malformed_rate: fraction of requests answered with a 200 body without bulk items
+        :param seed: random seed so rejections are repeatable
+        '''
+
+        self.reject_rate = reject_rate
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.documents = {}
+        # index -> field path -> 'object' or 'value'
+        self.mappings = {}
+
+    def draw(self, count):
+        '''
+        :param count: number of random values
+        :return: list of random values between 0 and 1
+        '''
+
+        with self.lock:
+            return [self.random.random() for _ in range(count)]
+
+    def map_document(self, index, document):
+        '''
+        add the fields of a document to the mapping of its index
+        :param index: index name
+        :param document: json document
+        :return: error reason if a field conflicts with the mapping, the mapping is then left unchanged
+        '''
+
+        with self.lock:
+            mapping = self.mappings.setdefault(index, {})
+            added = {}
+            for path, kind in field_kinds(document):
+                mapped = added.get(path, mapping.get(path))
+                if mapped is not None and mapped != kind:
+                    return f'field [{path}] is mapped as {mapped} and cannot be changed to {kind}'
+                added[path] = kind
+            mapping.update(added)
+
+        return None
+
+    def count(self, statuses):
+        '''
+        count a request and the status of each of its documents
+        :param statuses: list of document statuses
+        :return: None
+        '''
+
+        with self.lock:
+            self.requests += 1
+            for status in statuses:
+                self.documents[status] = self.documents.get(status, 0) + 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    '''
+    reply to POST /_bulk with one item per action line
+    '''
+
+    protocol_version = 'HTTP/1.1'
+    settings = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        settings = self.settings
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path.split('?')[0] != '/_bulk':
+            return self.send(404, b'{"error": "no handler found"}')
+
+        # action and document lines alternate
+        lines = [line for line in body.splitlines() if line]
+        actions = [json.loads(line) for line in lines[0::2]]
+        documents = [json.loads(line) for line in lines[1::2]]
+        draws = settings.draw(len(actions) + 1)
+
+        if draws[-1] < settings.malformed_rate:
+            settings.count(['malformed'] * len(actions))
+            return self.send(200, b'{"took": 1, "errors": true}')
+
+        items = []
+        for action, document, draw in zip(actions, documents, draws):
+            op, meta = next(iter(action.items()))
+            item = {'_index': meta.get('_index'), '_id': meta.get('_id'), 'status': 201}
+            if draw < settings.reject_rate:
+                item.update(status=429, error=REJECTED)
+            elif draw < settings.reject_rate + settings.error_rate:
+                item.update(status=400, error=MAPPING_ERROR)
+            else:
+                conflict = settings.map_document(meta.get('_index'), document)
+                if conflict is not None:
+                    item.update(status=400, error=dict(MAPPING_ERROR, reason=conflict))
+            items.append({op: item})
+
+        statuses = [next(iter(item.values()))['status'] for item in items]
+        settings.count(statuses)
+        self.send(200, json.dumps({'took': 1, 'errors': any(status >= 300 for status in statuses),
+                                   'items': items}).encode())
+
+
+def create_server(port, settings):
+    '''
+    :param port: local port to listen on, 0 picks a free port
+    :param settings: StubSettings
+    :return: ThreadingHTTPServer, call serve_forever to start it
+    '''
+
+    handler = type('Handler', (StubHandler,), {'settings': settings})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+
+    return server
+
+
+@click.command()
+@click.option("-p", "--port", help="local port to listen on", type=int, default=9201)
+@click.option("--reject_rate", help="fraction of documents rejected with 429", type=float, default=0.0)
+@click.option("--error_rate", help="fraction of documents rejected with a mapping error", type=float, default=0.0)
+@click.option("--malformed_rate", help="fraction of requests answered with a malformed 200 body", type=float,
+              default=0.0)
+@click.option("--seed", help="random seed for rejections", type=int, default=0)
+def cli(port, reject_rate, error_rate, malformed_rate, seed):
+    """
+    run the stub elasticsearch bulk api until interrupted
+    :param port: local port
+    :param reject_rate: fraction of documents rejected with 429
+    :param error_rate: fraction of documents rejected with 400
+    :param malformed_rate: fraction of malformed responses
+    :param seed: random seed
+    :return: None
+    """
+
+    settings = StubSettings(reject_rate, error_rate, malformed_rate, seed)
+    server = create_server(port, settings)
+    print(f'stub elasticsearch listening on http://127.0.0.1:{server.server_port}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'served {settings.requests} bulk requests, documents by status: {settings.documents}')
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+'''
+local stand-in for the github traffic api used by the benchmarks
+replays the recorded payloads in bench/fixtures for every repo, with the dates moved so the last
+recorded day is yesterday, and simulates latency, 304 Not Modified replies, rate limits, and 500 errors
+graphql queries get the recorded repository metadata for every aliased repository
+
+rest and graphql requests each get rate_limit requests per rate_window seconds, once spent requests are
+answered with 403 until the window resets
+
+    python bench/github_stub.py -p 8765 --latency 0.05 --not_modified 0.5 --error_rate 0.01
+    python bench/github_stub.py -p 8765 --rate_limit 20 --rate_window 5
+'''
+
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import click
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# traffic endpoint -> fixture file
+ENDPOINTS = {
+    'views': 'views.json',
+    'clones': 'clones.json',
+    'popular/referrers': 'popular_referrers.json',
+}
+
+
+def load_fixtures(today):
+    '''
+    read the recorded payloads and move their dates so the last recorded day is the day before today
+    :param today: date the payloads are moved relative to
+    :return: dict of endpoint to json encoded body
+    '''
+
+    payloads = {}
+    for endpoint, fixture in ENDPOINTS.items():
+        with open(os.path.join(FIXTURES, fixture)) as f:
+            payloads[endpoint] = json.load(f)
+
+    last_day = max(item['timestamp'][:10] for type in ['views', 'clones'] for item in payloads[type][type])
+    shift = today - timedelta(days=1) - date.fromisoformat(last_day)
+
+    for type in ['views', 'clones']:
+        for item in payloads[type][type]:
+            item_date = date.fromisoformat(item['timestamp'][:10]) + shift
+            item['timestamp'] = f'{item_date.isoformat()}T00:00:00Z'
+
+    return {endpoint: json.dumps(payload).encode() for endpoint, payload in payloads.items()}
+
+
+def load_repository():
+    '''
+    :return: recorded graphql repository metadata
+    '''
+
+    with open(os.path.join(FIXTURES, 'repository.json')) as f:
+        return json.load(f)
+
+
+class StubSettings:
+    '''
+    behaviour of the stub server shared by all request handler threads
+    '''
+
+    def __init__(self, latency=0.0, not_modified=1.0, error_rate=0.0, rate_limit=1000000, seed=0, rate_window=60):
+        '''
+        :param latency: seconds to wait before each reply
+        :param not_modified: fraction of conditional requests with a matching ETag answered with 304
+        :param error_rate: fraction of requests answered with a 500 error
+        :param rate_limit: requests allowed per rate window, reported in the X-RateLimit headers
+        :param seed: random seed so error injection is repeatable
+        :param rate_window: seconds until the rate limit resets
+        '''
+
+        self.latency = latency
+        self.not_modified = not_modified
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # resource -> [remaining, reset epoch seconds], like github the rest and graphql budgets are separate
+        self.budgets = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self.payloads = load_fixtures(datetime.now(timezone.utc).date())
+        self.repository = load_repository()
+
+    def next_request(self, resource):
+        '''
+        count a request against the rate limit of its resource and draw its random outcome
+        :param resource: rate limit resource, core or graphql
+        :return: tuple of (remaining requests, reset epoch seconds, True if over the limit,
+            random value between 0 and 1)
+        '''
+
+        with self.lock:
+            self.requests += 1
+            now = time.time()
+            budget = self.budgets.get(resource)
+            if budget is None or now >= budget[1]:
+                # the reset is a whole second so clients waiting for the reported reset never arrive early
+                budget = self.budgets[resource] = [self.rate_limit, math.ceil(now + self.rate_window)]
+
+            limited = budget[0] == 0
+            if limited:
+                self.rate_limited += 1
+            else:
+                budget[0] -= 1
+
+            return budget[0], budget[1], limited, self.random.random()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    '''
+    reply to GET /repos/{org}/{repo}/traffic/{endpoint} and POST /graphql with the recorded payloads
+    '''
+
+    protocol_version = 'HTTP/1.1'
+    settings = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-RateLimit-Limit', str(self.settings.rate_limit))
+        self.send_header('X-RateLimit-Remaining', str(self.remaining))
+        self.send_header('X-RateLimit-Reset', str(self.reset))
+        self.send_header('X-RateLimit-Resource', self.resource)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_rate_limited(self):
+        '''
+        reply 403 like github once the budget of the resource is spent
+        :return: None
+        '''
+
+        self.send(403, b'{"message": "API rate limit exceeded"}')
+
+    def do_GET(self):
+        settings = self.settings
+        self.resource = 'core'
+        self.remaining, self.reset, limited, draw = settings.next_request(self.resource)
+        if settings.latency:
+            time.sleep(settings.latency)
+
+        if limited:
+            return self.send_rate_limited()
+
+        parts = self.path.split('?')[0].strip('/').split('/')
+        endpoint = '/'.join(parts[4:])
+        if parts[:1] != ['repos'] or parts[3:4] != ['traffic'] or endpoint not in settings.payloads:
+            return self.send(404, b'{"message": "Not Found"}')
+
+        if draw < settings.error_rate:
+            return self.send(500, b'{"message": "Server Error"}')
+
+        etag = f'"{endpoint}"'
+        if self.headers.get('If-None-Match') == etag and draw < settings.error_rate + settings.not_modified:
+            return self.send(304)
+
+        self.send(200, settings.payloads[endpoint], {'ETag': etag})
+
+    def do_POST(self):
+        settings = self.settings
+        self.resource = 'graphql'
+        self.remaining, self.reset, limited, draw = settings.next_request(self.resource)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if settings.latency:
+            time.sleep(settings.latency)
+
+        if self.path != '/graphql':
+            return self.send(404, b'{"message": "Not Found"}')
+
+        if limited:
+            return self.send_rate_limited()
+
+        if draw < settings.error_rate:
+            return self.send(500, b'{"message": "Server Error"}')
+
+        query = json.loads(body)['query']
+        data = {alias: settings.repository for alias in re.findall(r'(\w+): repository\(', query)}
+        self.send(200, json.dumps({'data': data}).encode())
+
+
+def create_server(port, settings):
+    '''
+    :param port: local port to listen on, 0 picks a free port
+    :param settings: StubSettings
+    :return: ThreadingHTTPServer, call serve_forever to start it
+    '''
+
+    handler = type('Handler', (StubHandler,), {'settings': settings})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+
+    return server
+
+
+@click.command()
+@click.option("-p", "--port", help="local port to listen on", type=int, default=8765)
+@click.option("--latency", help="seconds to wait before each reply", type=float, default=0.0)
+@click.option("--not_modified", help="fraction of conditional requests answered with 304", type=float, default=1.0)
+@click.option("--error_rate", help="fraction of requests answered with a 500 error", type=float, default=0.0)
+@click.option("--rate_limit", help="requests per rate window before requests are answered with 403", type=int,
+              default=1000000)
+@click.option("--rate_window", help="seconds until the rate limit resets", type=int, default=60)
+@click.option("--seed", help="random seed for error injection", type=int, default=0)
+def cli(port, latency, not_modified, error_rate, rate_limit, rate_window, seed):
+    """
+    run the stub github api until interrupted
+    :param port: local port
+    :param latency: reply latency in seconds
+    :param not_modified: fraction of conditional requests answered with 304
+    :param error_rate: fraction of requests answered with 500
+    :param rate_limit: requests per rate window
+    :param rate_window: rate limit window in seconds
+    :param seed: random seed
+    :return: None
+    """
+
+    settings = StubSettings(latency, not_modified, error_rate, rate_limit, seed, rate_window)
+    server = create_server(port, settings)
+    print(f'stub github api listening on http://127.0.0.1:{server.server_port}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'served {settings.requests} requests, {settings.rate_limited} over the rate limit')
+
+
+if __name__ == '__main__':
+    cli()
@@ -1,3 +0,0 @@
-# python mostly static config values
-# bulk load elasticsearch url/ip and port
-elastic_url_port = 'localhost:9200'
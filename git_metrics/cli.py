@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import importlib
+
+import click
+
+# sub-command name -> (module, short help)
+# modules are only imported when their command runs, so startup only pays for click
+COMMANDS = {
+    'json': ('git_metrics.json_out', 'collect traffic stats as elasticsearch bulk load json'),
+    'quick': ('git_metrics.quick', 'show traffic stats for one or more repos on screen'),
+    'csv': ('git_metrics.csv_out', 'collect traffic stats as csv files'),
+    'daemon': ('git_metrics.daemon', 'keep collecting traffic stats on a jittered schedule'),
+    'history': ('git_metrics.history', 'query and export the local traffic history database'),
+}
+
+
+class LazyGroup(click.Group):
+    '''
+    click group that imports a sub-command's module the first time the command is used
+    '''
+
+    def list_commands(self, ctx):
+        return list(COMMANDS)
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in COMMANDS:
+            return None
+
+        module = importlib.import_module(COMMANDS[cmd_name][0])
+        return module.cli
+
+    def format_commands(self, ctx, formatter):
+        # use the static help text so --help does not import every sub-command
+        with formatter.section('Commands'):
+            formatter.write_dl([(name, short_help) for name, (_, short_help) in COMMANDS.items()])
+
+
+@click.group(cls=LazyGroup)
+def cli():
+    """
+    github repo traffic metrics
+    """
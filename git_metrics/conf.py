@@ -0,0 +1,87 @@
+# python mostly static config values
+import os
+
+# bulk load elasticsearch url/ip and port
+elastic_url_port = 'localhost:9200'
+
+# github api base url, override to point at a local stub server for testing
+github_api_url = 'https://api.github.com'
+# graphql endpoint, None for {github_api_url}/graphql, set to https://{host}/api/graphql for github enterprise
+github_graphql_url = None
+
+# github api http session settings
+# pool size is the number of keep-alive connections held open to the api
+github_pool_size = 10
+github_timeout = 30
+# retries on 5xx and secondary rate limit responses, backoff doubles each attempt
+github_max_retries = 5
+github_backoff_factor = 1.0
+
+# rate limit scheduling per auth token
+# requests held back from each token's hourly budget to cover requests already in flight
+github_rate_limit_reserve = 10
+# once a token's remaining budget drops below this fraction of its limit, requests are
+# spread evenly over the time left until the limit resets instead of sent in a burst
+github_rate_limit_pacing_threshold = 0.1
+
+# on-disk cache of api responses used for conditional (If-None-Match) requests
+# least recently used entries are removed once the cache grows past cache_max_bytes
+cache_dir = 'cache_output'
+cache_max_bytes = 100 * 1024 * 1024
+
+# write buffer size in bytes for the bulk load and csv output files
+output_buffer_size = 1024 * 1024
+
+# repo metadata added to daily documents with --enrich, fetched for up to enrich_batch_size repos per
+# graphql query and cached in cache_dir for enrich_ttl seconds
+enrich_batch_size = 100
+enrich_ttl = 24 * 60 * 60
+
+# columnar output written with --parquet, partitioned by date under parquet_dir/daily and parquet_dir/referrer
+parquet_dir = 'parquet_output'
+parquet_compression = 'zstd'
+
+# gzip compression level of csv output written with --gzip
+csv_compress_level = 6
+
+# direct bulk loading to elasticsearch with --load
+# documents are sent in chunks bounded by size and count, several chunks in parallel
+elastic_auth = None  # ('username', 'password') if security features enabled
+elastic_chunk_bytes = 5 * 1024 * 1024
+elastic_chunk_docs = 5000
+elastic_workers = 4
+elastic_max_retries = 5
+elastic_backoff_factor = 1.0
+elastic_timeout = 120
+
+# sqlite database recording the last fully collected day per org/repo
+state_db = 'state_output/state.db'
+# days before the last collected day that are collected again, github can still be counting the latest utc day
+collect_overlap_days = 1
+
+# json runs checkpoint their progress to state_db every checkpoint_repos repos so --resume can continue them
+checkpoint_repos = 100
+
+# sqlite database keeping all collected traffic beyond github's 14 day window
+history_db = 'state_output/history.db'
+
+# json run summary of request latency percentiles, request counts, retries, and bytes written
+metrics_dir = 'metrics_output'
+
+# the daemon command refreshes each repo once per daemon_interval seconds, spread evenly over the
+# interval and shifted by up to daemon_jitter of the interval, failed repos are retried after
+# daemon_retry_delay seconds
+daemon_interval = 24 * 60 * 60
+daemon_jitter = 0.05
+daemon_retry_delay = 15 * 60
+
+# org repo lists discovered with --org are cached for this many seconds
+repo_list_ttl = 24 * 60 * 60
+
+# settings in a conf.py next to the git_metrics package, where they were kept before the package existed,
+# override the defaults above so existing deployments keep their settings
+_root_conf = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'conf.py')
+if os.path.isfile(_root_conf):
+    import runpy
+
+    globals().update({name: value for name, value in runpy.run_path(_root_conf).items() if not name.startswith('_')})
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import sys
+from datetime import datetime, timezone
+
+import click
+
+from git_metrics.csv_writer import CsvWriter
+from git_metrics.github_client import GitApiError
+from git_metrics.pipeline import build_repo_list, create_client, generate_repo_rows, source_options
+
+SUMMARY_FIELDNAMES = [
+    'metrics.github.summary.date',
+    'metrics.github.summary.type',
+    'metrics.github.summary.org',
+    'metrics.github.summary.repo',
+    'metrics.github.summary.count',
+    'metrics.github.summary.uniques',
+]
+
+DAILY_FIELDNAMES = [
+    'metrics.github.daily.date',
+    'metrics.github.daily.type',
+    'metrics.github.daily.org',
+    'metrics.github.daily.repo',
+    'metrics.github.daily.count',
+    'metrics.github.daily.uniques',
+]
+
+REFERRER_FIELDNAMES = [
+    'metrics.github.referrer.date',
+    'metrics.github.referrer.type',
+    'metrics.github.referrer.org',
+    'metrics.github.referrer.repo',
+    'metrics.github.referrer.referrer',
+    'metrics.github.referrer.count',
+    'metrics.github.referrer.uniques',
+]
+
+
+def daily_csv_rows(stats_dict):
+    '''
+    split a daily stats document into one csv row per traffic type
+    :param stats_dict: daily stats dict from the shared row pipeline
+    :return: generator of daily csv row dicts
+    '''
+
+    for type in ['views', 'clones']:
+        row = {}
+        row['metrics.github.daily.date'] = stats_dict['date']
+        row['metrics.github.daily.type'] = type
+        row['metrics.github.daily.org'] = stats_dict['metrics.github.org']
+        row['metrics.github.daily.repo'] = stats_dict['metrics.github.repo']
+        row['metrics.github.daily.count'] = stats_dict[f'metrics.github.{type}.daily.count']
+        row['metrics.github.daily.uniques'] = stats_dict[f'metrics.github.{type}.daily.uniques']
+
+        yield row
+
+
+def summary_csv_rows(stats_dict):
+    '''
+    14 day summary csv rows carried by the last daily stats document of a repo
+    :param stats_dict: daily stats dict from the shared row pipeline
+    :return: generator of summary csv row dicts, empty if the document has no summary stats
+    '''
+
+    if 'metrics.github.views.summary.count' not in stats_dict:
+        return
+
+    for type in ['views', 'clones']:
+        row = {}
+        row['metrics.github.summary.date'] = stats_dict['date']
+        row['metrics.github.summary.type'] = type
+        row['metrics.github.summary.org'] = stats_dict['metrics.github.org']
+        row['metrics.github.summary.repo'] = stats_dict['metrics.github.repo']
+        row['metrics.github.summary.count'] = stats_dict[f'metrics.github.{type}.summary.count']
+        row['metrics.github.summary.uniques'] = stats_dict[f'metrics.github.{type}.summary.uniques']
+
+        yield row
+
+
+def referrer_csv_row(stats_dict):
+    '''
+    :param stats_dict: referrer stats dict from the shared row pipeline
+    :return: referrer csv row dict
+    '''
+
+    row = {}
+    row['metrics.github.referrer.date'] = stats_dict['date']
+    row['metrics.github.referrer.type'] = 'referrers'
+    row['metrics.github.referrer.org'] = stats_dict['metrics.github.org']
+    row['metrics.github.referrer.repo'] = stats_dict['metrics.github.repo']
+    row['metrics.github.referrer.referrer'] = stats_dict['metrics.github.referrer.referrer']
+    row['metrics.github.referrer.count'] = stats_dict['metrics.github.referrer.count']
+    row['metrics.github.referrer.uniques'] = stats_dict['metrics.github.referrer.uniques']
+
+    return row
+
+
+@click.command()
+@source_options
+@click.option("--gzip", "compress", help="gzip compress the csv output files", is_flag=True)
+def cli(git_auth_token, filename, orgs, include_archived, include_forks, visibility, days_ago, workers, cache_dir,
+        no_cache, compress):
+    """
+    grab github traffic stats and generate csv output
+    :param git_token: personal auth tokens used for API access
+    :param filenamme: csv list of orgs and repos
+    :param orgs: github orgs whose repos are discovered through the api
+    :param include_archived: keep archived repos of discovered orgs
+    :param include_forks: keep forked repos of discovered orgs
+    :param visibility: visibility of discovered repos to keep
+    :param days_ago: look back num days ago
+    :param workers: number of repos to fetch concurrently
+    :param cache_dir: directory for cached api responses
+    :param no_cache: send unconditional requests without the response cache
+    :param compress: write gzip compressed csv files
+    :return: None
+    """
+
+    # timestamp to be added to the file name
+    filedate = datetime.now().strftime('%Y-%m-%dT%H-%M-%SZ')
+
+    client = create_client(git_auth_token, workers, cache_dir, no_cache)
+    repo_list = build_repo_list(client, filename, orgs, workers, include_archived, include_forks, visibility,
+                                None if no_cache else cache_dir)
+
+    # github traffic days are utc days
+    now = datetime.now(timezone.utc)
+    repo_days_ago = {org_repo: days_ago for org_repo in repo_list}
+
+    # csv output files are moved into place when the writers close at the end of the run
+    daily_writer = CsvWriter(f'csv_output/daily_stats-{filedate}.csv', DAILY_FIELDNAMES, compress)
+    summary_writer = CsvWriter(f'csv_output/14day_summary_stats-{filedate}.csv', SUMMARY_FIELDNAMES, compress)
+    referrer_writer = CsvWriter(f'csv_output/referrer_stats-{filedate}.csv', REFERRER_FIELDNAMES, compress)
+
+    try:
+        with daily_writer, summary_writer, referrer_writer:
+            # fetch traffic concurrently and write results in input file order
+            for org, repo, daily_rows, referrer_rows in generate_repo_rows(client, repo_list, workers,
+                                                                           repo_days_ago, now):
+                for stats_dict in daily_rows:
+                    for row in daily_csv_rows(stats_dict):
+                        daily_writer.write(row)
+                    for row in summary_csv_rows(stats_dict):
+                        summary_writer.write(row)
+
+                for stats_dict in referrer_rows:
+                    referrer_writer.write(referrer_csv_row(stats_dict))
+    except GitApiError as e:
+        print(e)
+        print('\nCorrect errors and rerun the application\n')
+        sys.exit()
+    finally:
+        client.close()
+
+    for writer in [daily_writer, summary_writer, referrer_writer]:
+        print(f'wrote {writer.filename}')
+
+
+if __name__ == '__main__':
+    cli()
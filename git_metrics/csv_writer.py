@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import csv
+import gzip
+import io
+import os
+
+from git_metrics import conf
+from git_metrics.run_metrics import output_name, run_metrics
+
+
+class CsvWriter:
+    '''
+    write csv rows through a single buffered file handle, optionally gzip compressed
+    the header is written once when the file is opened and one DictWriter is reused for every row
+    output goes to a temp file that is renamed into place on close, same as the bulk load writer
+    '''
+
+    def __init__(self, filename, fieldnames, compress=False, buffer_size=None):
+        '''
+        :param filename: name of the output file, .gz is appended when compressed
+        :param fieldnames: csv column names in output order
+        :param compress: gzip the output
+        :param buffer_size: write buffer size in bytes, defaults to conf.output_buffer_size
+        '''
+
+        self.filename = f'{filename}.gz' if compress else filename
+        self.tmp_filename = f'{self.filename}.tmp'
+        buffer_size = conf.output_buffer_size if buffer_size is None else buffer_size
+
+        if compress:
+            self.f = open(self.tmp_filename, 'wb')
+            # buffer ahead of the compressor so it is handed large blocks instead of single rows
+            self.gzip_file = gzip.GzipFile(fileobj=self.f, mode='wb', compresslevel=conf.csv_compress_level)
+            stream = io.BufferedWriter(self.gzip_file, buffer_size=buffer_size)
+        else:
+            self.f = open(self.tmp_filename, 'wb', buffering=buffer_size)
+            self.gzip_file = None
+            stream = self.f
+
+        self.text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        self.writer = csv.DictWriter(self.text, fieldnames=fieldnames)
+        self.writer.writeheader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, row):
+        '''
+        write one row
+        :param row: dict keyed by the csv column names
+        :return: None
+        '''
+
+        self.writer.writerow(row)
+
+    def _close_streams(self):
+        # closing the gzip stream writes its trailer but leaves the underlying file open
+        self.text.flush()
+        if self.gzip_file is not None:
+            self.text.close()
+
+    def close(self):
+        '''
+        flush the buffered output to disk and move the temp file to the output filename
+        :return: None
+        '''
+
+        self._close_streams()
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        run_metrics.increment('bytes_written', os.path.getsize(self.tmp_filename), output=output_name(self.filename))
+        self.f.close()
+        os.replace(self.tmp_filename, self.filename)
+
+    def abort(self):
+        '''
+        discard the output written so far
+        :return: None
+        '''
+
+        self._close_streams()
+        self.f.close()
+        os.remove(self.tmp_filename)
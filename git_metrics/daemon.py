@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import heapq
+import math
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+
+import click
+
+from git_metrics import conf
+from git_metrics.elastic_loader import BulkLoader, ElasticLoadError
+from git_metrics.github_client import GitApiError
+from git_metrics.history_store import HistoryStore
+from git_metrics.ndjson_writer import document_id
+from git_metrics.pipeline import (build_repo_list, create_client, days_to_collect, generate_repo_rows, list_repos,
+                                  source_options)
+from git_metrics.run_metrics import run_metrics, write_atomic
+from git_metrics.state_store import StateStore
+
+
+class RefreshSchedule:
+    '''
+    next refresh time of every repo, ordered so the next repo due is always at the front
+    repos are spread evenly over the refresh interval and each refresh time is moved by a random jitter
+    so refreshes never line up into a burst against the rate limit
+    '''
+
+    def __init__(self, interval, jitter, rng=None):
+        '''
+        :param interval: seconds between refreshes of a repo
+        :param jitter: largest random shift of a refresh time as a fraction of the interval
+        :param rng: random.Random used for the jitter
+        '''
+
+        self.interval = interval
+        self.jitter = jitter
+        self.random = random.Random() if rng is None else rng
+        self.heap = []
+        # (org, repo) -> refresh time before the jitter, repos keep their place in the interval through it
+        self.base = {}
+
+    def shift(self):
+        return self.random.uniform(-self.jitter, self.jitter) * self.interval
+
+    def plan(self, repo_list, saved, now):
+        '''
+        schedule every repo in the list
+        repos already on the schedule or with a saved refresh time still ahead keep it, new repos and repos
+        that became overdue while the daemon was stopped are spread evenly over the next interval
+        :param repo_list: list of (org, repo) tuples
+        :param saved: dict of (org, repo) to saved unix refresh time
+        :param now: unix time
+        :return: dict of (org, repo) to refresh time for the newly scheduled repos
+        '''
+
+        times = {org_repo: scheduled for scheduled, org_repo in self.heap}
+        for org_repo in repo_list:
+            if org_repo not in times and saved.get(org_repo, now) > now:
+                # a saved time further out than one interval is left from a longer interval setting
+                times[org_repo] = min(saved[org_repo], now + self.interval)
+
+        # overdue repos keep their order so the schedule stays close to the one before the downtime
+        unscheduled = sorted((org_repo for org_repo in repo_list if org_repo not in times and org_repo in saved),
+                             key=lambda org_repo: saved[org_repo])
+        unscheduled += [org_repo for org_repo in repo_list if org_repo not in times and org_repo not in saved]
+        spacing = self.interval / max(len(unscheduled), 1)
+        planned = {}
+        for i, org_repo in enumerate(unscheduled):
+            self.base[org_repo] = now + i * spacing
+            planned[org_repo] = max(self.base[org_repo] + self.shift(), now)
+        times.update(planned)
+
+        self.heap = [(times[org_repo], org_repo) for org_repo in repo_list]
+        heapq.heapify(self.heap)
+        self.base = {org_repo: self.base.get(org_repo, times[org_repo]) for org_repo in repo_list}
+
+        return planned
+
+    def next_time(self):
+        '''
+        :return: unix time of the next refresh, None if nothing is scheduled
+        '''
+
+        return self.heap[0][0] if self.heap else None
+
+    def due(self, now, limit):
+        '''
+        take the repos whose refresh time has passed off the schedule
+        :param now: unix time
+        :param limit: max number of repos to take
+        :return: list of (refresh time, (org, repo)) in refresh time order
+        '''
+
+        due = []
+        while self.heap and self.heap[0][0] <= now and len(due) < limit:
+            due.append(heapq.heappop(self.heap))
+
+        return due
+
+    def reschedule(self, scheduled, org_repo, now, delay=None):
+        '''
+        put a repo back on the schedule one interval after its last refresh time
+        refreshes missed while the repo waited are skipped in whole intervals so the repo keeps its place
+        in the interval, and the jitter is added to that place rather than to the last jittered time
+        :param scheduled: refresh time the repo was due at
+        :param org_repo: (org, repo) tuple
+        :param now: unix time
+        :param delay: seconds until a retry instead of the next interval
+        :return: next unix refresh time
+        '''
+
+        if delay is not None:
+            # jitter retries too so repos that failed together are not retried together
+            next_refresh = now + delay * (1 + self.random.uniform(0, max(self.jitter, 0.1)))
+        else:
+            base = self.base.get(org_repo, scheduled) + self.interval
+            if base < now:
+                base += math.ceil((now - base) / self.interval) * self.interval
+            self.base[org_repo] = base
+            next_refresh = max(base + self.shift(), now)
+        heapq.heappush(self.heap, (next_refresh, org_repo))
+
+        return next_refresh
+
+
+def collect_batch(client, batch, workers, days_ago, state, history, load):
+    '''
+    collect traffic for a batch of due repos into the history database and optionally elasticsearch
+    a failed repo does not stop the other repos of the batch
+    :param client: GitClient used for API access
+    :param batch: list of (org, repo) tuples
+    :param workers: number of repos to fetch concurrently
+    :param days_ago: look back num days
+    :param state: StateStore
+    :param history: HistoryStore
+    :param load: also bulk load the documents to elasticsearch
+    :return: dict of failed (org, repo) to error
+    :raises ElasticLoadError: if documents are rejected by elasticsearch
+    '''
+
+    # github traffic days are utc days
+    now = datetime.now(timezone.utc)
+    last_days = state.last_days()
+    repo_days_ago = {org_repo: days_to_collect(days_ago, last_days.get(org_repo), now.date()) for org_repo in batch}
+
+    # repos refreshed again on the same day have no new days to collect
+    batch = [org_repo for org_repo in batch if repo_days_ago[org_repo] > 0]
+    failures = {}
+    if not batch:
+        return failures
+
+    collected_days = {}
+    loader = BulkLoader() if load else None
+    try:
+        for org, repo, daily_rows, referrer_rows in generate_repo_rows(client, batch, workers, repo_days_ago, now,
+                                                                       failures):
+            with run_metrics.timer('stage_seconds', stage='history'):
+                history.upsert_daily(daily_rows)
+                history.upsert_referrers(referrer_rows)
+            if daily_rows:
+                collected_days[(org, repo)] = daily_rows[-1]['date'][:10]
+
+            if loader is not None:
+                for stats_dict in daily_rows:
+                    loader.write(stats_dict, 'daily', document_id(stats_dict))
+                for stats_dict in referrer_rows:
+                    loader.write(stats_dict, 'referrer', document_id(stats_dict))
+
+        if loader is not None:
+            loader.close()
+    finally:
+        if loader is not None:
+            loader.abort()
+
+    # days only count as collected once they are loaded, so a failed load is collected again on retry
+    state.set_last_days(collected_days)
+
+    return failures
+
+
+@click.command()
+@source_options
+@click.option("--interval", help="seconds between refreshes of each repo", type=int, default=conf.daemon_interval)
+@click.option("--jitter", help="random shift of each refresh as a fraction of the interval", type=float,
+              default=conf.daemon_jitter)
+@click.option("--load", help="also bulk load documents directly to elasticsearch", is_flag=True)
+@click.option("--state_db", help="database of the last collected day per repo", type=str, default=conf.state_db)
+@click.option("--history_db", help="database keeping all collected traffic", type=str, default=conf.history_db)
+@click.option("--prometheus_textfile", help="keep the collector metrics in a prometheus textfile", type=str,
+              default='')
+def cli(git_auth_token, filename, orgs, include_archived, include_forks, visibility, days_ago, workers, cache_dir,
+        no_cache, interval, jitter, load, state_db, history_db, prometheus_textfile):
+    """
+    keep collecting github traffic stats, refreshing each repo once per interval
+    :param git_token: personal auth tokens used for API access
+    :param filenamme: csv list of orgs and repos
+    :param orgs: github orgs whose repos are discovered through the api
+    :param include_archived: keep archived repos of discovered orgs
+    :param include_forks: keep forked repos of discovered orgs
+    :param visibility: visibility of discovered repos to keep
+    :param days_ago: look back num days for repos never collected before
+    :param workers: number of repos to fetch concurrently
+    :param cache_dir: directory for cached api responses
+    :param no_cache: send unconditional requests without the response cache
+    :param interval: seconds between refreshes of each repo
+    :param jitter: random shift of each refresh as a fraction of the interval
+    :param load: stream documents to the elasticsearch bulk api as they are collected
+    :param state_db: sqlite database of the last collected day and next refresh per org/repo
+    :param history_db: sqlite database the collected stats are added to
+    :param prometheus_textfile: .prom file rewritten after every batch
+    :return: None
+    """
+
+    # finish the current batch and exit on SIGTERM or ctrl-c
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print('\nstopping after the current batch')
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    # one client for the life of the daemon keeps pooled connections and cached responses warm
+    client = create_client(git_auth_token, workers, cache_dir, no_cache)
+    list_cache_dir = None if no_cache else cache_dir
+    repo_list = build_repo_list(client, filename, orgs, workers, include_archived, include_forks, visibility,
+                                list_cache_dir)
+    state = StateStore(state_db)
+    history = HistoryStore(history_db)
+    run_metrics.reset()
+
+    schedule = RefreshSchedule(interval, jitter)
+    state.set_next_refreshes(schedule.plan(repo_list, state.next_refreshes(), time.time()))
+    list_refreshed = time.time()
+    metrics_started = time.time()
+    print(f'refreshing {len(repo_list)} repos every {interval} seconds')
+
+    try:
+        while not stop.is_set():
+            now = time.time()
+
+            # pick up repos added to or removed from the list or orgs
+            if now - list_refreshed >= conf.repo_list_ttl:
+                try:
+                    repo_list = list_repos(client, filename, orgs, workers, include_archived, include_forks,
+                                           visibility, list_cache_dir)
+                    state.set_next_refreshes(schedule.plan(repo_list, state.next_refreshes(), now))
+                except GitApiError as e:
+                    print(f'keeping the current repo list after error: {e}')
+                list_refreshed = now
+
+            due = schedule.due(now, max(workers, 1))
+            if not due:
+                next_time = schedule.next_time()
+                wait = list_refreshed + conf.repo_list_ttl - now
+                if next_time is not None:
+                    wait = min(wait, next_time - now)
+                stop.wait(max(wait, 0))
+                continue
+
+            batch = [org_repo for _, org_repo in due]
+            try:
+                failures = collect_batch(client, batch, workers, days_ago, state, history, load)
+            except ElasticLoadError as e:
+                print(e)
+                failures = {org_repo: str(e) for org_repo in batch}
+            if failures:
+                print(f'retrying {len(failures)} repos in about {conf.daemon_retry_delay} seconds')
+
+            # only failed repos are retried early, the others keep their place in the interval
+            now = time.time()
+            state.set_next_refreshes({
+                org_repo: schedule.reschedule(scheduled, org_repo, now,
+                                              conf.daemon_retry_delay if org_repo in failures else None)
+                for scheduled, org_repo in due})
+
+            if prometheus_textfile:
+                write_atomic(prometheus_textfile, run_metrics.prometheus_text())
+
+            # keep one summary per interval instead of growing the timings for the life of the daemon
+            if now - metrics_started >= interval:
+                filedate = datetime.now().strftime('%Y-%m-%dT%H-%M-%SZ')
+                run_metrics.write_json(f'{conf.metrics_dir}/daemon-{filedate}.json')
+                run_metrics.reset()
+                metrics_started = now
+    finally:
+        client.close()
+        state.close()
+        history.close()
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from git_metrics import conf
+from git_metrics.github_client import create_session
+from git_metrics.ndjson_writer import ActionLines, dumps
+from git_metrics.run_metrics import run_metrics
+
+
+class ElasticLoadError(Exception):
+    '''
+    raised when documents could not be loaded to elasticsearch
+    '''
+
+
+class BulkLoader:
+    '''
+    stream documents to the elasticsearch _bulk api in size and count bounded chunks
+    chunks are posted in parallel over a pooled session, documents rejected with 429 are retried
+    '''
+
+    def __init__(self, url=None, chunk_bytes=None, chunk_docs=None, workers=None, max_retries=None,
+                 backoff_factor=None):
+        '''
+        :param url: bulk api url, defaults to http://{conf.elastic_url_port}/_bulk
+        :param chunk_bytes: max request body size, defaults to conf.elastic_chunk_bytes
+        :param chunk_docs: max documents per request, defaults to conf.elastic_chunk_docs
+        :param workers: chunks posted in parallel, defaults to conf.elastic_workers
+        :param max_retries: retries for rejected documents, defaults to conf.elastic_max_retries
+        :param backoff_factor: base backoff in seconds, defaults to conf.elastic_backoff_factor
+        '''
+
+        self.url = f'http://{conf.elastic_url_port}/_bulk' if url is None else url
+        self.chunk_bytes = conf.elastic_chunk_bytes if chunk_bytes is None else chunk_bytes
+        self.chunk_docs = conf.elastic_chunk_docs if chunk_docs is None else chunk_docs
+        self.max_retries = conf.elastic_max_retries if max_retries is None else max_retries
+        self.backoff_factor = conf.elastic_backoff_factor if backoff_factor is None else backoff_factor
+        workers = conf.elastic_workers if workers is None else workers
+
+        self.session = create_session(workers)
+        self.session.auth = conf.elastic_auth
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # limit chunks held in memory while waiting for a free worker
+        self.slots = threading.BoundedSemaphore(workers * 2)
+        self.futures = []
+
+        self.action_lines = ActionLines()
+        self.chunk = []
+        self.chunk_size = 0
+
+        self.lock = threading.Lock()
+        self.loaded = 0
+        self.errors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data_dict, type, doc_id=None):
+        '''
+        queue one document for loading, posting the current chunk once it is full
+        :param data_dict: dict contained one json entry
+        :param type: data traffic type used as the elasticsearch index name
+        :param doc_id: optional document _id
+        :return: None
+        '''
+
+        item = self.action_lines.get(type, doc_id) + dumps(data_dict) + b'\n'
+
+        if self.chunk and (self.chunk_size + len(item) > self.chunk_bytes or len(self.chunk) >= self.chunk_docs):
+            self.flush()
+
+        self.chunk.append(item)
+        self.chunk_size += len(item)
+
+    def flush(self):
+        '''
+        post the current chunk in the background
+        :return: None
+        '''
+
+        if not self.chunk:
+            return
+
+        chunk = self.chunk
+        self.chunk = []
+        self.chunk_size = 0
+
+        self.slots.acquire()
+        future = self.executor.submit(self.send, chunk)
+        future.add_done_callback(lambda f: self.slots.release())
+        self.futures.append(future)
+
+    def send(self, chunk):
+        '''
+        post a chunk to the bulk api, retrying the whole request on 429 and 5xx responses and
+        individual documents rejected with 429, a 200 response that cannot be parsed fails the whole chunk
+        :param chunk: list of action and document line pairs
+        :return: None
+        '''
+
+        headers = {'Content-Type': 'application/x-ndjson'}
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.url, data=b''.join(chunk), headers=headers,
+                                             timeout=conf.elastic_timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                response = None
+                error = str(e)
+            else:
+                error = f'{response.status_code} {response.text[:200]}'
+
+            if response is not None and response.ok:
+                try:
+                    statuses = [next(iter(item.values())) for item in response.json()['items']]
+                    if len(statuses) != len(chunk):
+                        raise ValueError(f'{len(statuses)} items for {len(chunk)} documents')
+                    status_codes = [status.get('status', 500) for status in statuses]
+                except (ValueError, KeyError, TypeError, AttributeError, StopIteration) as e:
+                    # documents of a body that cannot be matched up are reported as failed rather than retried
+                    error = f'malformed bulk response: {e!r} {response.text[:200]}'
+                    break
+
+                retry = []
+                loaded = 0
+
+                for status, status_code, line in zip(statuses, status_codes, chunk):
+                    if status_code < 300:
+                        loaded += 1
+                    elif status_code == 429:
+                        retry.append(line)
+                    else:
+                        with self.lock:
+                            self.errors.append(status.get('error'))
+                        run_metrics.increment('elastic_documents', status='error')
+
+                with self.lock:
+                    self.loaded += loaded
+                run_metrics.increment('elastic_documents', loaded, status='loaded')
+                if retry:
+                    run_metrics.increment('elastic_documents', len(retry), status='retried')
+
+                if not retry:
+                    return
+                chunk = retry
+                error = f'{len(retry)} documents rejected with 429'
+
+            elif response is not None and response.status_code != 429 and response.status_code < 500:
+                break
+
+            if attempt < self.max_retries:
+                time.sleep(self.backoff_factor * (2 ** attempt))
+
+        with self.lock:
+            self.errors.extend([error] * len(chunk))
+        run_metrics.increment('elastic_documents', len(chunk), status='error')
+
+    def close(self):
+        '''
+        post any remaining documents and wait for all chunks to finish
+        :return: None
+        '''
+
+        self.flush()
+
+        for future in self.futures:
+            future.result()
+
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+        if self.errors:
+            raise ElasticLoadError(f'{len(self.errors)} documents failed to load, first error: {self.errors[0]}')
+
+    def abort(self):
+        '''
+        drop chunks that have not been posted yet, does nothing after close
+        :return: None
+        '''
+
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.session.close()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from git_metrics import conf
+from git_metrics.run_metrics import write_atomic
+
+# fields queried for every repo
+REPO_FIELDS = '''
+    url
+    stargazerCount
+    forkCount
+    issues(states: OPEN) { totalCount }
+    primaryLanguage { name }
+    repositoryTopics(first: 20) { nodes { topic { name } } }
+'''
+
+
+def build_query(batch):
+    '''
+    one graphql query for a batch of repos, each repo under its own alias
+    org and repo names are passed as variables so they never need escaping
+    :param batch: list of (org, repo) tuples
+    :return: tuple of (query, variables)
+    '''
+
+    declarations = []
+    selections = []
+    variables = {}
+    for i, (org, repo) in enumerate(batch):
+        declarations.append(f'$o{i}: String!, $n{i}: String!')
+        selections.append(f'r{i}: repository(owner: $o{i}, name: $n{i}) {{{REPO_FIELDS}}}')
+        variables[f'o{i}'] = org
+        variables[f'n{i}'] = repo
+
+    query = f'query({", ".join(declarations)}) {{\n' + '\n'.join(selections) + '\n}'
+
+    return query, variables
+
+
+# metrics.github.repo already holds the repo name, elasticsearch would need it to also be an object
+# for metrics.github.repo.* fields, so the metadata gets its own prefix
+METADATA_PREFIX = 'metrics.github.repo_info'
+
+
+def repo_metadata(node):
+    '''
+    :param node: repository node of the graphql response
+    :return: dict of document keys to the repo metadata
+    '''
+
+    metadata = {}
+    metadata[f'{METADATA_PREFIX}.url'] = node['url']
+    metadata[f'{METADATA_PREFIX}.stars'] = node['stargazerCount']
+    metadata[f'{METADATA_PREFIX}.forks'] = node['forkCount']
+    metadata[f'{METADATA_PREFIX}.open_issues'] = node['issues']['totalCount']
+    metadata[f'{METADATA_PREFIX}.language'] = (node['primaryLanguage'] or {}).get('name')
+    metadata[f'{METADATA_PREFIX}.topics'] = [item['topic']['name'] for item in node['repositoryTopics']['nodes']]
+
+    return metadata
+
+
+def fetch_metadata(client, batch):
+    '''
+    query the metadata of a batch of repos
+    :param client: GitClient used for API access
+    :param batch: list of (org, repo) tuples
+    :return: dict of (org, repo) to metadata, repos the api could not resolve are left out
+    '''
+
+    query, variables = build_query(batch)
+    data = client.graphql(query, variables)
+
+    return {org_repo: repo_metadata(data[f'r{i}']) for i, org_repo in enumerate(batch) if data.get(f'r{i}')}
+
+
+class RepoEnricher:
+    '''
+    repo metadata merged into daily documents
+    metadata is fetched for up to batch_size repos per graphql query instead of one rest call per repo
+    and cached per org for ttl seconds
+    '''
+
+    def __init__(self, client, cache_dir=None, ttl=None, batch_size=None, workers=1):
+        '''
+        :param client: GitClient used for API access
+        :param cache_dir: directory for cached metadata or None to always fetch
+        :param ttl: max age in seconds of cached metadata, defaults to conf.enrich_ttl
+        :param batch_size: repos per query, defaults to conf.enrich_batch_size
+        :param workers: number of queries to send concurrently
+        '''
+
+        self.client = client
+        self.cache_dir = cache_dir
+        self.ttl = conf.enrich_ttl if ttl is None else ttl
+        self.batch_size = conf.enrich_batch_size if batch_size is None else batch_size
+        self.workers = max(workers, 1)
+        # (org, repo) -> metadata
+        self.metadata = {}
+
+    def cache_file(self, org):
+        return os.path.join(self.cache_dir, 'repo_info', f'{org}.json')
+
+    def load_cache(self, orgs):
+        '''
+        :param orgs: orgs to load cached metadata for
+        :return: dict of (org, repo) to {'fetched_at', 'metadata'}
+        '''
+
+        cached = {}
+        for org in orgs:
+            try:
+                with open(self.cache_file(org)) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for repo, entry in entries.items():
+                cached[(org, repo)] = entry
+
+        return cached
+
+    def save_cache(self, cached):
+        '''
+        :param cached: dict of (org, repo) to {'fetched_at', 'metadata'}
+        :return: None
+        '''
+
+        by_org = {}
+        for (org, repo), entry in cached.items():
+            by_org.setdefault(org, {})[repo] = entry
+
+        for org, entries in by_org.items():
+            write_atomic(self.cache_file(org), json.dumps(entries))
+
+    def prefetch(self, repo_list):
+        '''
+        load the metadata of every repo, querying the api only for repos without fresh cached metadata
+        :param repo_list: list of (org, repo) tuples
+        :return: None
+        :raises GitApiError: if a query fails
+        '''
+
+        now = time.time()
+        cached = {} if self.cache_dir is None else self.load_cache({org for org, _ in repo_list})
+        stale = []
+        for org_repo in repo_list:
+            entry = cached.get(org_repo)
+            if entry is not None and now - entry['fetched_at'] < self.ttl:
+                self.metadata[org_repo] = entry['metadata']
+            else:
+                stale.append(org_repo)
+
+        batches = [stale[i:i + self.batch_size] for i in range(0, len(stale), self.batch_size)]
+        if batches:
+            print(f'\nquerying metadata for {len(stale)} repos in {len(batches)} graphql queries\n')
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for fetched in executor.map(lambda batch: fetch_metadata(self.client, batch), batches):
+                self.metadata.update(fetched)
+                for org_repo, metadata in fetched.items():
+                    cached[org_repo] = {'fetched_at': now, 'metadata': metadata}
+
+        if self.cache_dir is not None and batches:
+            self.save_cache(cached)
+
+    def enrich(self, stats_dict):
+        '''
+        add the repo metadata to a stats document
+        :param stats_dict: daily stats dict
+        :return: None
+        '''
+
+        metadata = self.metadata.get((stats_dict['metrics.github.org'], stats_dict['metrics.github.repo']))
+        if metadata is not None:
+            stats_dict.update(metadata)
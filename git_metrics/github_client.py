@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from git_metrics import conf
+from git_metrics.rate_limiter import RateLimitScheduler
+from git_metrics.response_cache import cache_key
+from git_metrics.run_metrics import endpoint_name, run_metrics
+
+
+class GitApiError(Exception):
+    '''
+    raised when a github api request fails after all retries
+    '''
+
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+# errors while sending a request or reading its body that are worth retrying
+TRANSIENT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)
+
+
+def response_json(response):
+    '''
+    parse a json response body
+    :param response: requests response
+    :return: parsed json
+    :raises GitApiError: if the body is not valid json, such as a truncated 200 response
+    '''
+
+    try:
+        return response.json()
+    except ValueError as e:
+        raise GitApiError(f'{response.url}: invalid json response: {e}', response)
+
+
+def create_session(pool_size):
+    '''
+    create a requests session that keeps connections to the api alive between requests
+    :param pool_size: max number of pooled connections per host
+    :return: requests session
+    '''
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+def is_retryable(response):
+    '''
+    check if a failed response is transient and worth retrying
+    5xx errors and secondary rate limits are retried, auth and not found errors are not
+    :param response: requests response
+    :return: True if the request should be retried
+    '''
+
+    if response.status_code >= 500 or response.status_code == 429:
+        return True
+
+    if response.status_code == 403:
+        if is_rate_limited(response) or 'secondary rate limit' in response.text.lower():
+            return True
+
+    return False
+
+
+def is_rate_limited(response):
+    '''
+    check if the api rejected a request because a rate limit was hit
+    the scheduler holds the next request until the limit resets so no extra backoff is needed
+    :param response: requests response
+    :return: True if the response is a rate limit rejection
+    '''
+
+    return 'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0'
+
+
+class GitClient:
+    '''
+    shared github api client with a pooled keep-alive session and retry with exponential backoff
+    requests are paced by a RateLimitScheduler that rotates across the auth tokens
+    '''
+
+    def __init__(self, git_auth_token, pool_size=None, max_retries=None, backoff_factor=None, timeout=None,
+                 cache=None):
+        '''
+        :param git_auth_token: personal auth token or list of tokens used for API access
+        :param pool_size: number of pooled connections, defaults to conf.github_pool_size
+        :param max_retries: retries for transient errors, defaults to conf.github_max_retries
+        :param backoff_factor: base backoff in seconds, defaults to conf.github_backoff_factor
+        :param timeout: request timeout in seconds, defaults to conf.github_timeout
+        :param cache: optional ResponseCache used for conditional requests
+        '''
+
+        tokens = [git_auth_token] if isinstance(git_auth_token, str) else list(git_auth_token)
+        self.scheduler = RateLimitScheduler(tokens or [''])
+        self.max_retries = conf.github_max_retries if max_retries is None else max_retries
+        self.backoff_factor = conf.github_backoff_factor if backoff_factor is None else backoff_factor
+        self.timeout = conf.github_timeout if timeout is None else timeout
+        self.session = create_session(conf.github_pool_size if pool_size is None else pool_size)
+        self.cache = cache
+
+    def backoff(self, attempt):
+        '''
+        sleep before the next retry
+        Retry-After headers are honored by the scheduler before the retry is sent
+        :param attempt: zero based retry attempt
+        :return: None
+        '''
+
+        time.sleep(self.backoff_factor * (2 ** attempt))
+
+    def request(self, method, git_api_url, endpoint, headers=None, resource='core', **kwargs):
+        '''
+        send a request to the github api, retrying transient errors
+        :param method: http method
+        :param git_api_url: full request url
+        :param endpoint: endpoint name the request is counted under in the run metrics
+        :param headers: optional extra request headers
+        :param resource: rate limit resource the request counts against
+        :param kwargs: passed on to requests, such as params or json
+        :return: requests response
+        '''
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                run_metrics.increment('github_retries', endpoint=endpoint)
+
+            # time spent holding the request back for the rate limit
+            start = time.perf_counter()
+            token = self.scheduler.acquire(resource)
+            request_start = time.perf_counter()
+            run_metrics.increment('github_rate_limit_wait_seconds', request_start - start)
+
+            request_headers = {"Authorization": f"token {token}"}
+            request_headers.update(headers or {})
+
+            try:
+                response = self.session.request(method, git_api_url, headers=request_headers, timeout=self.timeout,
+                                                **kwargs)
+            except requests.exceptions.RequestException as e:
+                run_metrics.increment('github_requests', endpoint=endpoint, status='error')
+                if attempt == self.max_retries or not isinstance(e, TRANSIENT_ERRORS):
+                    raise GitApiError(f'{git_api_url}: {e}')
+                print(f'retrying {git_api_url} after error: {e}')
+                self.backoff(attempt)
+                continue
+
+            run_metrics.observe('github_request_seconds', time.perf_counter() - request_start, endpoint=endpoint)
+            run_metrics.increment('github_requests', endpoint=endpoint, status=response.status_code)
+            self.scheduler.update(token, response)
+
+            if response.ok:
+                return response
+
+            if attempt == self.max_retries or not is_retryable(response):
+                raise GitApiError(f'{response}\n{response.text}', response)
+
+            print(f'retrying {git_api_url} after {response.status_code} response')
+            if not is_rate_limited(response):
+                self.backoff(attempt)
+
+    def get(self, path, params=None, headers=None):
+        '''
+        send a GET request to the github api
+        :param path: api path appended to conf.github_api_url
+        :param params: optional query string parameters
+        :param headers: optional extra request headers
+        :return: requests response
+        '''
+
+        return self.request('GET', f'{conf.github_api_url}{path}', endpoint_name(path), headers, params=params)
+
+    def graphql(self, query, variables=None):
+        '''
+        send a query to the github graphql api
+        :param query: graphql query
+        :param variables: optional dict of query variables
+        :return: data of the response, entries the api could not resolve are None
+        '''
+
+        git_graphql_url = conf.github_graphql_url or f'{conf.github_api_url}/graphql'
+        response = self.request('POST', git_graphql_url, '/graphql', resource='graphql',
+                                json={'query': query, 'variables': variables or {}})
+        body = response_json(response)
+
+        # unresolved entries such as deleted repos are reported as errors alongside the other results
+        if body.get('data') is None:
+            raise GitApiError(f'{response}\n{response.text}', response)
+
+        return body['data']
+
+    def get_json(self, path, params=None):
+        '''
+        send a GET request and return the parsed json body
+        with a cache, the request is conditional and a 304 Not Modified is served from the cache
+        304 responses do not count against the api rate limit
+        :param path: api path appended to conf.github_api_url
+        :param params: optional query string parameters
+        :return: parsed json response
+        '''
+
+        if self.cache is None:
+            return response_json(self.get(path, params))
+
+        key = cache_key(path, params)
+        entry = self.cache.get(key)
+
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.get(path, params, headers)
+        if response.status_code == 304 and entry is not None:
+            return entry['body']
+
+        body = response_json(response)
+        self.cache.put(key, response.headers.get('ETag'), response.headers.get('Last-Modified'), body)
+
+        return body
+
+    def close(self):
+        '''
+        close pooled connections
+        '''
+
+        self.session.close()
+
+
+def git_api_query_traffic(client, org, repo, type):
+    """
+    grab github traffic stats
+    curl -i -H "Authorization: token {git_token}" https://api.github.com/repos/{org}/{repo}/traffic/{type}
+    :param client: GitClient used for API access
+    :param org: github org name used in API request
+    :param repo: github repo name used in API request
+    :param type: type of traffic including views, clones, referrers
+    :return: query_reponse_dict
+    """
+
+    query_response_dict = client.get_json(f'/repos/{org}/{repo}/traffic/{type}')
+
+    return query_response_dict
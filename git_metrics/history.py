@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import time
+from datetime import datetime
+
+import click
+
+from git_metrics import conf
+from git_metrics.history_store import HistoryStore
+from git_metrics.ndjson_writer import BulkWriter, document_id
+
+
+@click.group()
+def cli():
+    """
+    query and export the local traffic history database
+    """
+
+
+@cli.command()
+@click.option("--history_db", help="traffic history database", type=str, default=conf.history_db)
+@click.option("-o", "--org", help="github org", type=str, default=None)
+@click.option("-r", "--repo", help="github repo", type=str, default=None)
+@click.option("-s", "--start", help="first date as YYYY-MM-DD", type=str, default=None)
+@click.option("-e", "--end", help="last date as YYYY-MM-DD", type=str, default=None)
+def query(history_db, org, repo, start, end):
+    """
+    print daily traffic stats for a repo and date range
+    :param history_db: sqlite traffic history database
+    :param org: github org
+    :param repo: github repo
+    :param start: first date
+    :param end: last date
+    :return: None
+    """
+
+    store = HistoryStore(history_db)
+    query_start = time.perf_counter()
+    rows = list(store.query_daily(org, repo, start, end))
+    query_time = time.perf_counter() - query_start
+    store.close()
+
+    print('org/repo, date, views count, views unique, clones count, clones unique')
+    for stats_dict in rows:
+        print(f"  {stats_dict['metrics.github.org']}/{stats_dict['metrics.github.repo']}, "
+              f"{stats_dict['date'][:10]}, "
+              f"{stats_dict['metrics.github.views.daily.count']}, {stats_dict['metrics.github.views.daily.uniques']}, "
+              f"{stats_dict['metrics.github.clones.daily.count']}, {stats_dict['metrics.github.clones.daily.uniques']}")
+
+    print(f'\n{len(rows)} rows in {query_time * 1000:.1f} ms')
+
+
+@cli.command()
+@click.option("--history_db", help="traffic history database", type=str, default=conf.history_db)
+@click.option("-o", "--org", help="github org", type=str, default=None)
+@click.option("-r", "--repo", help="github repo", type=str, default=None)
+@click.option("-s", "--start", help="first date as YYYY-MM-DD", type=str, default=None)
+@click.option("-e", "--end", help="last date as YYYY-MM-DD", type=str, default=None)
+def export(history_db, org, repo, start, end):
+    """
+    regenerate elasticsearch bulk load files from the history database
+    :param history_db: sqlite traffic history database
+    :param org: github org
+    :param repo: github repo
+    :param start: first date
+    :param end: last date
+    :return: None
+    """
+
+    # timestamp to be added to the file name
+    filedate = datetime.now().strftime('%Y-%m-%dT%H-%M-%SZ')
+
+    store = HistoryStore(history_db)
+
+    try:
+        with BulkWriter(f'daily_output/daily-{filedate}.json') as daily_writer:
+            for stats_dict in store.query_daily(org, repo, start, end):
+                daily_writer.write(stats_dict, 'daily', document_id(stats_dict))
+
+        with BulkWriter(f'referrer_output/referrer-{filedate}.json') as referrer_writer:
+            for stats_dict in store.query_referrers(org, repo, start, end):
+                referrer_writer.write(stats_dict, 'referrer', document_id(stats_dict))
+    finally:
+        store.close()
+
+    print('\nuse the XPOST curl command to load json data to elasticSearch\n')
+
+    for type in ['daily', 'referrer']:
+        print(
+            f'curl -s -XPOST \'http://{conf.elastic_url_port}/_bulk\' '
+            f'--data-binary @{type}_output/{type}-{filedate}.json '
+            f'-H \"Content-Type: application/x-ndjson\" \n')
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import os
+import sqlite3
+
+from git_metrics import conf
+
+# daily stats document keys and the history table columns they are stored in
+DAILY_COLUMNS = [
+    ('metrics.github.org', 'org'),
+    ('metrics.github.repo', 'repo'),
+    ('date', 'date'),
+    ('metrics.github.views.daily.count', 'views_count'),
+    ('metrics.github.views.daily.uniques', 'views_uniques'),
+    ('metrics.github.clones.daily.count', 'clones_count'),
+    ('metrics.github.clones.daily.uniques', 'clones_uniques'),
+    ('metrics.github.views.summary.count', 'views_summary_count'),
+    ('metrics.github.views.summary.uniques', 'views_summary_uniques'),
+    ('metrics.github.clones.summary.count', 'clones_summary_count'),
+    ('metrics.github.clones.summary.uniques', 'clones_summary_uniques'),
+]
+
+# referrer stats document keys and the history table columns they are stored in
+REFERRER_COLUMNS = [
+    ('date', 'date'),
+    ('metrics.github.org', 'org'),
+    ('metrics.github.repo', 'repo'),
+    ('metrics.github.referrer.referrer', 'referrer'),
+    ('metrics.github.referrer.count', 'count'),
+    ('metrics.github.referrer.uniques', 'uniques'),
+]
+
+
+class HistoryStore:
+    '''
+    sqlite store of every daily and referrer stats document collected
+    rows are keyed by org, repo, and date so repo and date range queries are index lookups
+    '''
+
+    def __init__(self, db_path=None):
+        '''
+        :param db_path: sqlite database file, defaults to conf.history_db
+        '''
+
+        db_path = conf.history_db if db_path is None else db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self.db = sqlite3.connect(db_path)
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')
+        with self.db:
+            self.db.execute('''
+                CREATE TABLE IF NOT EXISTS daily_traffic (
+                    org TEXT NOT NULL,
+                    repo TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    views_count INTEGER NOT NULL,
+                    views_uniques INTEGER NOT NULL,
+                    clones_count INTEGER NOT NULL,
+                    clones_uniques INTEGER NOT NULL,
+                    views_summary_count INTEGER,
+                    views_summary_uniques INTEGER,
+                    clones_summary_count INTEGER,
+                    clones_summary_uniques INTEGER,
+                    PRIMARY KEY (org, repo, date)
+                ) WITHOUT ROWID''')
+            self.db.execute('''
+                CREATE TABLE IF NOT EXISTS referrer_traffic (
+                    org TEXT NOT NULL,
+                    repo TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    referrer TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    uniques INTEGER NOT NULL,
+                    PRIMARY KEY (org, repo, date, referrer)
+                ) WITHOUT ROWID''')
+            # date range queries across all repos
+            self.db.execute('CREATE INDEX IF NOT EXISTS daily_traffic_date ON daily_traffic (date)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS referrer_traffic_date ON referrer_traffic (date)')
+
+    def upsert(self, table, columns, rows):
+        '''
+        insert stats documents, replacing rows already stored for the same key
+        :param table: history table name
+        :param columns: list of (document key, column) pairs
+        :param rows: iterable of stats dicts
+        :return: None
+        '''
+
+        names = ', '.join(column for _, column in columns)
+        values = ', '.join('?' for _ in columns)
+        with self.db:
+            self.db.executemany(
+                f'INSERT OR REPLACE INTO {table} ({names}) VALUES ({values})',
+                [[stats_dict.get(key) for key, _ in columns] for stats_dict in rows])
+
+    def upsert_daily(self, rows):
+        '''
+        :param rows: iterable of daily stats dicts
+        :return: None
+        '''
+
+        self.upsert('daily_traffic', DAILY_COLUMNS, rows)
+
+    def upsert_referrers(self, rows):
+        '''
+        :param rows: iterable of referrer stats dicts
+        :return: None
+        '''
+
+        self.upsert('referrer_traffic', REFERRER_COLUMNS, rows)
+
+    def query(self, table, columns, org=None, repo=None, start=None, end=None):
+        '''
+        read stats documents back in org, repo, date order
+        :param table: history table name
+        :param columns: list of (document key, column) pairs
+        :param org: optional github org to filter on
+        :param repo: optional github repo to filter on
+        :param start: optional first date as YYYY-MM-DD
+        :param end: optional last date as YYYY-MM-DD
+        :return: generator of stats dicts
+        '''
+
+        where = []
+        params = []
+        if org is not None:
+            where.append('org = ?')
+            params.append(org)
+        if repo is not None:
+            where.append('repo = ?')
+            params.append(repo)
+        if start is not None:
+            where.append('date >= ?')
+            params.append(f'{start}T00:00:00Z')
+        if end is not None:
+            where.append('date <= ?')
+            params.append(f'{end}T00:00:00Z')
+
+        names = ', '.join(column for _, column in columns)
+        sql = f'SELECT {names} FROM {table}'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY org, repo, date'
+
+        for row in self.db.execute(sql, params):
+            # summary columns are only set on the last day of a collection
+            yield {key: value for (key, _), value in zip(columns, row) if value is not None}
+
+    def query_daily(self, org=None, repo=None, start=None, end=None):
+        return self.query('daily_traffic', DAILY_COLUMNS, org, repo, start, end)
+
+    def query_referrers(self, org=None, repo=None, start=None, end=None):
+        return self.query('referrer_traffic', REFERRER_COLUMNS, org, repo, start, end)
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import sys
+from datetime import datetime, timezone
+
+import click
+
+from git_metrics import conf, parquet_writer
+from git_metrics.elastic_loader import BulkLoader, ElasticLoadError
+from git_metrics.enrichment import RepoEnricher
+from git_metrics.github_client import GitApiError
+from git_metrics.history_store import DAILY_COLUMNS, REFERRER_COLUMNS, HistoryStore
+from git_metrics.ndjson_writer import BulkWriter, document_id
+from git_metrics.pipeline import build_repo_list, create_client, days_to_collect, generate_repo_rows, source_options
+from git_metrics.run_metrics import run_metrics
+from git_metrics.state_store import StateStore
+
+
+def write_run_summary(filedate, prometheus_textfile):
+    '''
+    write the run metrics as json and optionally as a prometheus textfile
+    :param filedate: run date added to the file name
+    :param prometheus_textfile: .prom file name or empty
+    :return: None
+    '''
+
+    summary_filename = f'{conf.metrics_dir}/run-{filedate}.json'
+    run_metrics.write_json(summary_filename)
+    if prometheus_textfile:
+        run_metrics.write_prometheus(prometheus_textfile)
+    print(f'\nrun summary written to {summary_filename}')
+
+
+def save_checkpoint(state, run_id, daily_writer, referrer_writer, tables, part, collected, failures):
+    '''
+    flush the output written so far and record the repos it covers
+    :param state: StateStore
+    :param run_id: run date
+    :param daily_writer: daily BulkWriter
+    :param referrer_writer: referrer BulkWriter
+    :param tables: ParquetWriters, written as one part per checkpoint
+    :param part: number of the parquet part being written
+    :param collected: dict of (org, repo) to last collected day for repos finished since the last checkpoint
+    :param failures: dict of (org, repo) to error for repos failed during the run
+    :return: number of parquet parts written
+    '''
+
+    for table in tables:
+        table.close(part)
+    state.checkpoint(run_id, daily_writer.checkpoint(), referrer_writer.checkpoint(), part + 1, collected, failures)
+    collected.clear()
+
+    return part + 1
+
+
+@click.command()
+@source_options
+@click.option("--load", help="also bulk load documents directly to elasticsearch", is_flag=True)
+@click.option("--state_db", help="database of the last collected day per repo", type=str, default=conf.state_db)
+@click.option("--full", help="collect all days_ago days even if already collected", is_flag=True)
+@click.option("--history_db", help="database keeping all collected traffic", type=str, default=conf.history_db)
+@click.option("--parquet", help="also write date partitioned parquet files", is_flag=True)
+@click.option("--prometheus_textfile", help="also write the run summary in prometheus textfile format", type=str,
+              default='')
+@click.option("--resume", help="resume the last interrupted run or retry its failed repos", is_flag=True)
+@click.option("--enrich", help="add stars, forks, open issues, language, and topics to daily documents",
+              is_flag=True)
+def cli(git_auth_token, filename, orgs, include_archived, include_forks, visibility, days_ago, workers, cache_dir,
+        no_cache, load, state_db, full, history_db, parquet, prometheus_textfile, resume, enrich):
+    """
+    grab github traffic stats and generate csv output
+    :param git_token: personal auth tokens used for API access
+    :param filenamme: csv list of orgs and repos
+    :param orgs: github orgs whose repos are discovered through the api
+    :param include_archived: keep archived repos of discovered orgs
+    :param include_forks: keep forked repos of discovered orgs
+    :param visibility: visibility of discovered repos to keep
+    :param workers: number of repos to fetch concurrently
+    :param cache_dir: directory for cached api responses
+    :param no_cache: send unconditional requests without the response cache
+    :param load: stream documents to the elasticsearch bulk api as they are generated
+    :param state_db: sqlite database of the last collected day per org/repo
+    :param full: ignore the last collected day and emit the whole look back window
+    :param history_db: sqlite database the collected stats are added to
+    :param parquet: write columnar parquet files partitioned by date alongside the json output
+    :param prometheus_textfile: .prom file for the node exporter textfile collector
+    :param resume: continue the last incomplete run, appending to its output files
+    :param enrich: merge repo metadata queried in graphql batches into the daily documents
+    :return: None
+    """
+
+    if parquet:
+        # fail before any api requests are sent if pyarrow is missing
+        parquet_writer.import_pyarrow()
+
+    state = StateStore(state_db)
+    run = state.incomplete_run()
+    if resume:
+        if run is None:
+            state.close()
+            raise click.UsageError('there is no interrupted run to resume')
+        # a resumed run keeps the dates and look back window of the run it continues
+        filedate = run['run_id']
+        now = datetime.fromisoformat(run['started'])
+        days_ago = run['days_ago']
+        full = bool(run['full'])
+        collected_before, _ = state.run_repos(filedate)
+        print(f'\nresuming run {filedate}, {len(collected_before)} repos already collected')
+    else:
+        if run is not None:
+            print(f'\nrun {run["run_id"]} did not complete, use --resume to continue it')
+        # timestamp to be added to the file name
+        filedate = datetime.now().strftime('%Y-%m-%dT%H-%M-%SZ')
+        # github traffic days are utc days
+        now = datetime.now(timezone.utc)
+        collected_before = {}
+    run_metrics.reset()
+
+    client = create_client(git_auth_token, workers, cache_dir, no_cache)
+    repo_list = build_repo_list(client, filename, orgs, workers, include_archived, include_forks, visibility,
+                                None if no_cache else cache_dir)
+
+    # only collect the days after each repo's last collected day
+    last_days = {} if full else state.last_days()
+    repo_days_ago = {}
+    for org, repo in repo_list:
+        repo_days_ago[(org, repo)] = days_to_collect(days_ago, last_days.get((org, repo)), now.date())
+        if (org, repo) in last_days and repo_days_ago[(org, repo)] <= 0:
+            print(f'{org}/{repo} is up to date, skipping')
+    repo_list = [org_repo for org_repo in repo_list
+                 if (org_repo not in last_days or repo_days_ago[org_repo] > 0) and org_repo not in collected_before]
+    history = HistoryStore(history_db)
+
+    enricher = None
+    if enrich:
+        enricher = RepoEnricher(client, None if no_cache else cache_dir, workers=workers)
+        try:
+            with run_metrics.timer('stage_seconds', stage='enrich'):
+                enricher.prefetch(repo_list)
+        except GitApiError as e:
+            print(e)
+            print('\ncontinuing without repo metadata\n')
+
+    # json output files are moved into place when the run completes
+    # completed repos are checkpointed along with the file offsets after them so an interrupted run can resume
+    if resume:
+        daily_writer = BulkWriter(f'daily_output/daily-{filedate}.json', offset=run['daily_offset'])
+        referrer_writer = BulkWriter(f'referrer_output/referrer-{filedate}.json', offset=run['referrer_offset'])
+        part = run['parts']
+    else:
+        state.start_run(filedate, now.isoformat(), days_ago, full)
+        daily_writer = BulkWriter(f'daily_output/daily-{filedate}.json')
+        referrer_writer = BulkWriter(f'referrer_output/referrer-{filedate}.json')
+        part = 0
+    loader = BulkLoader() if load else None
+    daily_table = None
+    referrer_table = None
+    tables = []
+    if parquet:
+        daily_table = parquet_writer.ParquetWriter(f'{conf.parquet_dir}/daily', 'daily', DAILY_COLUMNS, filedate)
+        referrer_table = parquet_writer.ParquetWriter(f'{conf.parquet_dir}/referrer', 'referrer', REFERRER_COLUMNS,
+                                                      filedate)
+        tables = [daily_table, referrer_table]
+
+    collected = {}
+    failures = {}
+    loaded = False
+    try:
+        try:
+            # fetch traffic concurrently and write results in input file order
+            for org, repo, daily_rows, referrer_rows in generate_repo_rows(client, repo_list, workers,
+                                                                           repo_days_ago, now, failures):
+                with run_metrics.timer('stage_seconds', stage='write_output'):
+                    # write daily stats to file
+                    for stats_dict in daily_rows:
+                        if enricher is not None:
+                            enricher.enrich(stats_dict)
+                        doc_id = document_id(stats_dict)
+                        daily_writer.write(stats_dict, 'daily', doc_id)
+                        if loader is not None:
+                            loader.write(stats_dict, 'daily', doc_id)
+                        if daily_table is not None:
+                            daily_table.write(stats_dict)
+
+                    for stats_dict in referrer_rows:
+                        doc_id = document_id(stats_dict)
+                        referrer_writer.write(stats_dict, 'referrer', doc_id)
+                        if loader is not None:
+                            loader.write(stats_dict, 'referrer', doc_id)
+                        if referrer_table is not None:
+                            referrer_table.write(stats_dict)
+
+                # keep the stats past github's 14 day window
+                with run_metrics.timer('stage_seconds', stage='history'):
+                    history.upsert_daily(daily_rows)
+                    history.upsert_referrers(referrer_rows)
+
+                collected[(org, repo)] = daily_rows[-1]['date'][:10] if daily_rows else None
+                if len(collected) >= conf.checkpoint_repos:
+                    part = save_checkpoint(state, filedate, daily_writer, referrer_writer, tables, part, collected,
+                                           failures)
+
+            with run_metrics.timer('stage_seconds', stage='write_output'):
+                save_checkpoint(state, filedate, daily_writer, referrer_writer, tables, part, collected, failures)
+        except BaseException:
+            # keep the output up to the last checkpoint for --resume
+            daily_writer.abort(remove=False)
+            referrer_writer.abort(remove=False)
+            raise
+
+        daily_writer.close()
+        referrer_writer.close()
+
+        # days only count as collected once the output files are complete
+        collected_days, failures = state.run_repos(filedate)
+        state.set_last_days({org_repo: day for org_repo, day in collected_days.items() if day is not None})
+        if not failures:
+            # parts written at each checkpoint are merged once no resume can add more
+            with run_metrics.timer('stage_seconds', stage='write_output'):
+                for table in tables:
+                    table.compact()
+            state.finish_run(filedate)
+
+        if loader is not None:
+            loader.close()
+            print(f'\nloaded {loader.loaded} documents to elasticSearch at {conf.elastic_url_port}')
+            loaded = True
+    except ElasticLoadError as e:
+        print(e)
+        print('\nJson output files were written, use the curl commands below to reload them\n')
+    finally:
+        client.close()
+        state.close()
+        history.close()
+        if loader is not None:
+            loader.abort()
+        write_run_summary(filedate, prometheus_textfile)
+
+    if not loaded:
+        # print out the elasticSearch bulk load curl commands
+        print('\nUse curl -XDELETE [url]:[port]/index to delete data from the index')
+        print('use the XPOST curl command to load json data to elasticSearch')
+        print('add -u with username:password if security features enabled\n')
+
+        for type in ['daily', 'referrer']:
+            print(
+                f'curl -s -XPOST \'http://{conf.elastic_url_port}/_bulk\' '
+                f'--data-binary @{type}_output/{type}-{filedate}.json '
+                f'-H \"Content-Type: application/x-ndjson\" \n')
+
+    if failures:
+        print(f'\n{len(failures)} repos failed:')
+        for (org, repo), error in failures.items():
+            print(f'{org}/{repo}: {error}')
+        print('\nCorrect errors and rerun with --resume to collect the failed repos\n')
+
+    # a failed load is reported in the exit status like failed repos so cron and ci notice it
+    if failures or (load and not loaded):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import json
+import os
+
+from git_metrics import conf
+from git_metrics.run_metrics import output_name, run_metrics
+
+# orjson is optional, the standard library encoder is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data_dict):
+    '''
+    serialize a dict to a single line of json
+    :param data_dict: dict to serialize
+    :return: utf-8 encoded json bytes
+    '''
+
+    if orjson is not None:
+        return orjson.dumps(data_dict)
+
+    return json.dumps(data_dict, indent=None, sort_keys=False).encode()
+
+
+def elk_index(elk_index_name, doc_id=None):
+    '''
+    set up elasticsearch bulk load index
+    :param elk_index_name: name of data index in elasticsearch
+    :param doc_id: optional document _id so reloads overwrite instead of duplicate
+    :return: index tag to write as line in the output json file
+    '''
+
+    index_tag_full = {}
+    index_tag_inner = {}
+    index_tag_inner['_index'] = f'github-{elk_index_name}'
+    index_tag_inner['_type'] = '_doc'
+    if doc_id is not None:
+        index_tag_inner['_id'] = doc_id
+    index_tag_full['index'] = index_tag_inner
+
+    return index_tag_full
+
+
+def document_id(stats_dict):
+    '''
+    deterministic elasticsearch _id for a stats document so reloading a day overwrites it
+    :param stats_dict: daily or referrer stats dict
+    :return: org/repo/date for daily stats or org/repo/date/referrer for referrer stats
+    '''
+
+    doc_id = f"{stats_dict['metrics.github.org']}/{stats_dict['metrics.github.repo']}/{stats_dict['date'][:10]}"
+    if 'metrics.github.referrer.referrer' in stats_dict:
+        doc_id = f"{doc_id}/{stats_dict['metrics.github.referrer.referrer']}"
+
+    return doc_id
+
+
+class ActionLines:
+    '''
+    serialized bulk action lines, the part shared by every document in an index is encoded once
+    '''
+
+    def __init__(self):
+        self.prefixes = {}
+
+    def get(self, type, doc_id=None):
+        '''
+        :param type: data traffic type used as the elasticsearch index name
+        :param doc_id: optional document _id
+        :return: action line bytes including the trailing newline
+        '''
+
+        prefix = self.prefixes.get(type)
+        if prefix is None:
+            # drop the closing braces so a per document _id can be appended
+            prefix = dumps(elk_index(type))[:-2]
+            self.prefixes[type] = prefix
+
+        if doc_id is None:
+            return prefix + b'}}\n'
+
+        return prefix + b', "_id": ' + dumps(doc_id) + b'}}\n'
+
+
+class BulkWriter:
+    '''
+    write json documents formatted for bulk elasticsearch input through a single buffered file handle
+    output goes to a temp file that is renamed into place on close, so a failed run never leaves
+    a partially written bulk file behind
+    a resumed run reopens the file at its last checkpoint offset and appends to it
+    '''
+
+    def __init__(self, filename, buffer_size=None, offset=None):
+        '''
+        :param filename: name of the output file
+        :param buffer_size: write buffer size in bytes, defaults to conf.output_buffer_size
+        :param offset: checkpoint offset to resume the file at, None to start a new file
+        '''
+
+        self.filename = filename
+        self.tmp_filename = f'{filename}.tmp'
+        buffer_size = conf.output_buffer_size if buffer_size is None else buffer_size
+
+        if offset is None:
+            self.f = open(self.tmp_filename, 'wb', buffering=buffer_size)
+        else:
+            # a run that finished with failed repos already moved its file into place
+            if not os.path.exists(self.tmp_filename) and os.path.exists(filename):
+                os.replace(filename, self.tmp_filename)
+            self.f = open(self.tmp_filename, 'ab', buffering=buffer_size)
+            if self.f.tell() < offset:
+                self.f.close()
+                raise ValueError(f'{self.tmp_filename} is shorter than its checkpoint offset {offset}')
+            # drop documents written after the checkpoint, their repos are collected again
+            self.f.truncate(offset)
+            self.f.seek(offset)
+
+        self.action_lines = ActionLines()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data_dict, type, doc_id=None):
+        '''
+        write one document preceded by its bulk index action line
+        :param data_dict: dict contained one json entry
+        :param type: data traffic type used as the elasticsearch index name
+        :param doc_id: optional document _id
+        :return: None
+        '''
+
+        self.f.write(self.action_lines.get(type, doc_id))
+        self.f.write(dumps(data_dict))
+        self.f.write(b'\n')
+
+    def checkpoint(self):
+        '''
+        flush the buffered output so everything written so far survives a crash
+        :return: file offset to resume at
+        '''
+
+        self.f.flush()
+        return self.f.tell()
+
+    def close(self):
+        '''
+        flush the buffered output to disk and move the temp file to the output filename
+        :return: None
+        '''
+
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        run_metrics.increment('bytes_written', os.path.getsize(self.tmp_filename), output=output_name(self.filename))
+        self.f.close()
+        os.replace(self.tmp_filename, self.filename)
+
+    def abort(self, remove=True):
+        '''
+        discard the output written so far
+        :param remove: remove the temp file, False keeps it for a resumed run
+        :return: None
+        '''
+
+        self.f.close()
+        if remove:
+            os.remove(self.tmp_filename)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import glob
+import os
+
+import click
+
+from git_metrics import conf
+from git_metrics.run_metrics import run_metrics
+
+# string columns repeated on every row are stored dictionary encoded
+DICTIONARY_COLUMNS = {'org', 'repo', 'referrer'}
+
+
+def import_pyarrow():
+    '''
+    pyarrow is optional and only needed for --parquet output
+    imported here so commands that do not write parquet never pay its import time
+    :return: tuple of (pyarrow, pyarrow.parquet) modules
+    :raises click.UsageError: if pyarrow is not installed
+    '''
+
+    try:
+        import pyarrow
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise click.UsageError('--parquet needs the pyarrow package, install it with pip install pyarrow')
+
+    return pyarrow, pq
+
+
+def column_array(pyarrow, column, values):
+    '''
+    :param pyarrow: pyarrow module
+    :param column: column name
+    :param values: list of column values, None for missing summary stats
+    :return: dictionary encoded string array or int64 array
+    '''
+
+    if column in DICTIONARY_COLUMNS:
+        return pyarrow.array(values, type=pyarrow.string()).dictionary_encode()
+
+    return pyarrow.array(values, type=pyarrow.int64())
+
+
+class ParquetWriter:
+    '''
+    collect stats documents into columns and write one parquet file per date partition
+    files are written as {base_dir}/date={YYYY-MM-DD}/{name}-{run date}.parquet so a date range
+    is read as a hive partitioned dataset without scanning other days
+    closing with a part number writes the documents collected so far and the writer can be reused,
+    compact merges the parts into one file per date partition once the run is complete
+    '''
+
+    def __init__(self, base_dir, name, columns, filedate):
+        '''
+        :param base_dir: directory the date partitions are written under
+        :param name: file name prefix
+        :param columns: list of (document key, column name), the date column becomes the partition
+        :param filedate: run date added to the file names
+        '''
+
+        self.pyarrow, self.pq = import_pyarrow()
+
+        self.base_dir = base_dir
+        self.name = name
+        self.filedate = filedate
+        self.columns = [(key, column) for key, column in columns if column != 'date']
+        # date -> column name -> list of values
+        self.partitions = {}
+        self.filenames = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, stats_dict):
+        '''
+        add one stats document to its date partition
+        :param stats_dict: daily or referrer stats dict
+        :return: None
+        '''
+
+        day = stats_dict['date'][:10]
+        partition = self.partitions.get(day)
+        if partition is None:
+            partition = {column: [] for _, column in self.columns}
+            self.partitions[day] = partition
+
+        for key, column in self.columns:
+            partition[column].append(stats_dict.get(key))
+
+    def close(self, part=None):
+        '''
+        write each date partition to a temp file and move it into place
+        :param part: part number added to the file names when a run writes its partitions in several parts
+        :return: None
+        '''
+
+        suffix = '' if part is None else f'-{part:04d}'
+        for day, partition in sorted(self.partitions.items()):
+            pyarrow = self.pyarrow
+            table = pyarrow.Table.from_arrays(
+                [column_array(pyarrow, column, values) for column, values in partition.items()],
+                names=list(partition))
+
+            partition_dir = os.path.join(self.base_dir, f'date={day}')
+            os.makedirs(partition_dir, exist_ok=True)
+            filename = os.path.join(partition_dir, f'{self.name}-{self.filedate}{suffix}.parquet')
+            self.pq.write_table(table, f'{filename}.tmp', compression=conf.parquet_compression)
+            run_metrics.increment('bytes_written', os.path.getsize(f'{filename}.tmp'), output=f'{self.name}_parquet')
+            os.replace(f'{filename}.tmp', filename)
+            self.filenames.append(filename)
+
+        self.partitions = {}
+
+    def compact(self):
+        '''
+        merge the part files of this run into one file per date partition
+        parts left next to an already merged file are from an interrupted compaction and are removed
+        :return: None
+        '''
+
+        pyarrow = self.pyarrow
+        part_files = {}
+        for filename in glob.glob(os.path.join(self.base_dir, 'date=*', f'{self.name}-{self.filedate}-*.parquet')):
+            part_files.setdefault(os.path.dirname(filename), []).append(filename)
+
+        for partition_dir, parts in sorted(part_files.items()):
+            filename = os.path.join(partition_dir, f'{self.name}-{self.filedate}.parquet')
+            if not os.path.exists(filename):
+                tables = [self.pq.read_table(part, partitioning=None) for part in sorted(parts)]
+                # each part has its own dictionaries for the dictionary encoded columns
+                table = pyarrow.concat_tables(tables).unify_dictionaries().combine_chunks()
+                self.pq.write_table(table, f'{filename}.tmp', compression=conf.parquet_compression)
+                os.replace(f'{filename}.tmp', filename)
+                self.filenames.append(filename)
+
+            for part in parts:
+                os.remove(part)
+                if part in self.filenames:
+                    self.filenames.remove(part)
+
+    def abort(self):
+        '''
+        discard the documents collected so far
+        :return: None
+        '''
+
+        self.partitions = {}
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+
+from git_metrics import conf
+from git_metrics.github_client import GitApiError, GitClient, git_api_query_traffic
+from git_metrics.repo_discovery import discover_repos
+from git_metrics.response_cache import ResponseCache
+from git_metrics.run_metrics import run_metrics
+
+
+def source_options(command):
+    '''
+    add the options shared by every command that collects traffic stats for a repo list
+    :param command: click command function
+    :return: decorated command function
+    '''
+
+    options = [
+        click.option("-a", "--git_auth_token", help="git auth token, repeat to rotate across tokens", type=str,
+                     multiple=True),
+        click.option("-f", "--filename", help="csv list of orgs and repos", type=str, default=''),
+        click.option("--org", "orgs", help="collect all repos of a github org, repeat for several orgs", type=str,
+                     multiple=True),
+        click.option("--include_archived", help="include archived repos of --org orgs", is_flag=True),
+        click.option("--include_forks", help="include forked repos of --org orgs", is_flag=True),
+        click.option("--visibility", help="only include --org repos with this visibility",
+                     type=click.Choice(['all', 'public', 'private', 'internal']), default='all'),
+        click.option("-d", "--days_ago", help="look back num days ago (max 14)", type=int, default=14),
+        click.option("-w", "--workers", help="number of repos to fetch concurrently", type=int, default=1),
+        click.option("--cache_dir", help="api response cache directory", type=str, default=conf.cache_dir),
+        click.option("--no_cache", help="disable the api response cache", is_flag=True),
+    ]
+
+    for option in reversed(options):
+        command = option(command)
+
+    return command
+
+
+def create_client(git_auth_token, workers, cache_dir, no_cache):
+    '''
+    create the api client for a collection run
+    :param git_auth_token: personal auth tokens used for API access
+    :param workers: number of repos fetched concurrently
+    :param cache_dir: directory for cached api responses
+    :param no_cache: send unconditional requests without the response cache
+    :return: GitClient
+    '''
+
+    # pool at least one connection per worker so concurrent requests reuse keep-alive connections
+    cache = None if no_cache else ResponseCache(cache_dir)
+    return GitClient(git_auth_token, pool_size=max(conf.github_pool_size, workers), cache=cache)
+
+
+def read_repo_list(filename):
+    '''
+    read the org and repo list from the input csv file
+    blank lines and lines starting with # are skipped
+    :param filename: csv list of orgs and repos
+    :return: list of (org, repo) tuples in file order
+    '''
+
+    repo_list = []
+    with open(filename) as f:
+        for line_number, org_repo in enumerate(f, 1):
+            org_repo = org_repo.strip()
+            if not org_repo or org_repo.startswith('#'):
+                continue
+
+            org_repo_list = [value.strip() for value in org_repo.split(',')]
+            if len(org_repo_list) < 2 or not org_repo_list[0] or not org_repo_list[1]:
+                raise click.BadParameter(f'line {line_number} is not in org,repo format: {org_repo}',
+                                         param_hint='filename')
+            org = org_repo_list[0]
+            repo = org_repo_list[1]
+            # type = org_repo_list[2]  --> option to add to the list
+            repo_list.append((org, repo))
+
+    return repo_list
+
+
+def list_repos(client, filename, orgs, workers, include_archived, include_forks, visibility, cache_dir):
+    '''
+    build the org and repo list from the input csv file and org discovery
+    :param client: GitClient used for API access
+    :param filename: csv list of orgs and repos or empty
+    :param orgs: github orgs whose repos are discovered through the api
+    :param workers: number of pages to fetch concurrently
+    :param include_archived: keep archived repos of discovered orgs
+    :param include_forks: keep forked repos of discovered orgs
+    :param visibility: visibility of discovered repos to keep
+    :param cache_dir: directory for cached repo lists or None
+    :return: list of (org, repo) tuples
+    :raises GitApiError: if org discovery fails
+    '''
+
+    # input list of orgs and repos
+    repo_list = []
+    if filename:
+        print('\nreading org and repo list from file\n')
+        repo_list = read_repo_list(filename)
+
+    if orgs:
+        discovered = discover_repos(client, orgs, workers, include_archived, include_forks, visibility, cache_dir)
+        # repos listed in the file are not repeated
+        listed = set(repo_list)
+        repo_list.extend(org_repo for org_repo in discovered if org_repo not in listed)
+
+    return repo_list
+
+
+def build_repo_list(client, filename, orgs, workers, include_archived, include_forks, visibility, cache_dir):
+    '''
+    build the org and repo list, exiting with the api error if org discovery fails
+    parameters are the same as list_repos
+    :return: list of (org, repo) tuples
+    '''
+
+    try:
+        return list_repos(client, filename, orgs, workers, include_archived, include_forks, visibility, cache_dir)
+    except GitApiError as e:
+        print(e)
+        print('\nCorrect errors and rerun the application\n')
+        sys.exit()
+
+
+def days_to_collect(days_ago, last_day, today, overlap=None):
+    '''
+    number of days to look back for a repo, limited to the days after its last collected day
+    the last overlap days already collected are collected again since their counts may have still been growing
+    :param days_ago: look back num days requested for the run
+    :param last_day: last collected day as YYYY-MM-DD or None if never collected
+    :param today: utc date of the run, daily stats stop at the day before
+    :param overlap: days collected again, defaults to conf.collect_overlap_days
+    :return: num days to look back, 0 or less if the repo is up to date
+    '''
+
+    if last_day is None:
+        return days_ago
+
+    overlap = conf.collect_overlap_days if overlap is None else overlap
+    return min(days_ago, (today - datetime.strptime(last_day, '%Y-%m-%d').date()).days - 1 + overlap)
+
+
+def fetch_repo_traffic(client, org, repo):
+    '''
+    query the views, clones, and referrers traffic endpoints for a single repo
+    :param client: GitClient used for API access
+    :param org: github org name used in API request
+    :param repo: github repo name used in API request
+    :return: tuple of (views, clones, referrers) query responses
+    '''
+
+    print(f'getting stats for {org}/{repo}')
+
+    repo_traffic_views = git_api_query_traffic(client, org, repo, 'views')
+    repo_traffic_clones = git_api_query_traffic(client, org, repo, 'clones')
+    repo_traffic_referrers = git_api_query_traffic(client, org, repo, 'popular/referrers')
+
+    return repo_traffic_views, repo_traffic_clones, repo_traffic_referrers
+
+
+def fetch_all_traffic(client, repo_list, workers, failures=None):
+    '''
+    fetch traffic stats for every repo, running up to workers repos concurrently
+    results are yielded in the same order as repo_list regardless of completion order
+    :param client: GitClient used for API access
+    :param repo_list: list of (org, repo) tuples
+    :param workers: number of repos to fetch concurrently, 1 for serial
+    :param failures: optional dict, repos whose queries fail are added with their error and skipped
+        instead of the error ending the run
+    :return: generator of (org, repo, views, clones, referrers)
+    '''
+
+    def fetch(org_repo):
+        try:
+            return fetch_repo_traffic(client, *org_repo)
+        except GitApiError as e:
+            if failures is None:
+                raise
+            return e
+
+    if workers <= 1:
+        results = map(fetch, repo_list)
+        executor = None
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        results = executor.map(fetch, repo_list)
+
+    try:
+        for (org, repo), traffic in zip(repo_list, results):
+            if isinstance(traffic, GitApiError):
+                print(f'failed to get stats for {org}/{repo}: {traffic}')
+                failures[(org, repo)] = str(traffic)
+                continue
+            yield (org, repo) + traffic
+    finally:
+        # drop queued repos if a query error ends the run early
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def build_daily_rows(org, repo, repo_traffic_views, repo_traffic_clones, start_date, stop_date):
+    '''
+    generate one daily stats document per day from start_date up to stop_date
+    days without a views or clones entry are set to zero
+    the last day also carries the 14 day summary stats
+    :param org: github org name
+    :param repo: github repo name
+    :param repo_traffic_views: views query response
+    :param repo_traffic_clones: clones query response
+    :param start_date: datetime of the first day
+    :param stop_date: datetime to stop before
+    :return: generator of daily stats dicts
+    '''
+
+    # index daily entries by timestamp so each day is a single lookup
+    views = {item['timestamp']: item for item in repo_traffic_views['views']}
+    clones = {item['timestamp']: item for item in repo_traffic_clones['clones']}
+    no_traffic = {'count': 0, 'uniques': 0}
+
+    day = timedelta(days=1)
+    item_date = start_date
+
+    while item_date < stop_date:
+        # isoformat of the date is much cheaper than strftime on the datetime
+        date = f'{item_date.date().isoformat()}T00:00:00Z'
+        views_item = views.get(date, no_traffic)
+        clones_item = clones.get(date, no_traffic)
+
+        stats_dict = {}
+        stats_dict['metrics.github.org'] = org
+        stats_dict['metrics.github.repo'] = repo
+        # stats_dict['metric.github.repo.type'] = type
+        # stats_dict['metric.github.repo.url'] = f'https://github.com/{org}/{repo}'
+        stats_dict['date'] = date
+        stats_dict['metrics.github.views.daily.count'] = views_item['count']
+        stats_dict['metrics.github.views.daily.uniques'] = views_item['uniques']
+        stats_dict['metrics.github.clones.daily.count'] = clones_item['count']
+        stats_dict['metrics.github.clones.daily.uniques'] = clones_item['uniques']
+
+        item_date = item_date + day
+        if item_date > stop_date:
+            # 14day summary stats added to the prior day stats
+            stats_dict['metrics.github.views.summary.count'] = repo_traffic_views['count']
+            stats_dict['metrics.github.views.summary.uniques'] = repo_traffic_views['uniques']
+            stats_dict['metrics.github.clones.summary.count'] = repo_traffic_clones['count']
+            stats_dict['metrics.github.clones.summary.uniques'] = repo_traffic_clones['uniques']
+
+        yield stats_dict
+
+
+def build_referrer_rows(org, repo, repo_traffic_referrers, item_date):
+    '''
+    generate one referrer stats document per referrer
+    :param org: github org name
+    :param repo: github repo name
+    :param repo_traffic_referrers: popular/referrers query response
+    :param item_date: datetime the referrer stats are recorded under
+    :return: generator of referrer stats dicts
+    '''
+
+    date = item_date.strftime('%Y-%m-%dT00:00:00Z')
+
+    for item in repo_traffic_referrers:
+        # generates a unique entry for each date-repo-referrer
+        stats_dict = {}
+        stats_dict['date'] = date
+        stats_dict['metrics.github.org'] = org
+        stats_dict['metrics.github.repo'] = repo
+        stats_dict['metrics.github.referrer.referrer'] = item['referrer']
+        stats_dict['metrics.github.referrer.count'] = item['count']
+        stats_dict['metrics.github.referrer.uniques'] = item['uniques']
+
+        yield stats_dict
+
+
+def generate_repo_rows(client, repo_list, workers, repo_days_ago, now, failures=None):
+    '''
+    fetch traffic for every repo and build its daily and referrer stats, in repo_list order
+    :param client: GitClient used for API access
+    :param repo_list: list of (org, repo) tuples
+    :param workers: number of repos to fetch concurrently
+    :param repo_days_ago: dict of (org, repo) to look back num days
+    :param now: datetime of the run
+    :param failures: optional dict that failed repos are added to instead of ending the run
+    :return: generator of (org, repo, daily rows, referrer rows)
+    '''
+
+    stop_date = now - timedelta(minutes=1)
+    traffic = fetch_all_traffic(client, repo_list, workers, failures)
+
+    while True:
+        # time spent waiting on the api for the next repo in order
+        with run_metrics.timer('stage_seconds', stage='fetch_wait'):
+            repo_traffic_all = next(traffic, None)
+        if repo_traffic_all is None:
+            return
+        org, repo, repo_traffic_views, repo_traffic_clones, repo_traffic = repo_traffic_all
+
+        with run_metrics.timer('stage_seconds', stage='build_rows'):
+            # set start date for extraction of github query values
+            days_ago = repo_days_ago[(org, repo)]
+            start_date = now - timedelta(days=days_ago)
+
+            daily_rows = list(build_daily_rows(org, repo, repo_traffic_views, repo_traffic_clones,
+                                               start_date, stop_date))
+
+            # referrers are a 14 day total stamped with the day after the last daily entry
+            referrer_date = start_date + timedelta(days=max(days_ago, 0))
+            referrer_rows = list(build_referrer_rows(org, repo, repo_traffic, referrer_date))
+
+        run_metrics.increment('documents', len(daily_rows), type='daily')
+        run_metrics.increment('documents', len(referrer_rows), type='referrer')
+
+        yield org, repo, daily_rows, referrer_rows
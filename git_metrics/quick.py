@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from git_metrics import conf
+from git_metrics.github_client import GitApiError, GitClient, git_api_query_traffic
+from git_metrics.response_cache import ResponseCache
+
+
+# table columns as (heading, summary key)
+TABLE_COLUMNS = [
+    ('repo', 'repo'),
+    ('views', 'views'),
+    ('views unique', 'views_uniques'),
+    ('clones', 'clones'),
+    ('clones unique', 'clones_uniques'),
+    ('top referrer', 'top_referrer'),
+]
+
+
+def read_stdin_repos(lines):
+    '''
+    read repo values from stdin in the repo list csv format, org/repo, or repo
+    blank lines and lines starting with # are skipped like in the repo list file
+    :param lines: input lines
+    :return: list of org/repo or repo values
+    '''
+
+    values = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        if ',' in line:
+            org_repo_list = [value.strip() for value in line.split(',')]
+            if len(org_repo_list) < 2 or not org_repo_list[0] or not org_repo_list[1]:
+                raise click.BadParameter(f'stdin line {line_number} is not in org,repo format: {line}',
+                                         param_hint='repos')
+            values.append(f'{org_repo_list[0]}/{org_repo_list[1]}')
+        else:
+            values.extend(line.split())
+
+    return values
+
+
+def parse_repos(default_org, repos):
+    '''
+    build the org and repo list from org/repo or repo values, - reads the values from stdin
+    :param default_org: github org used for values without an org
+    :param repos: list of repo values
+    :return: list of (org, repo) tuples
+    '''
+
+    repo_list = []
+    for value in repos:
+        values = read_stdin_repos(sys.stdin) if value == '-' else [value]
+        for org_repo in values:
+            org, _, repo = org_repo.rpartition('/')
+            repo_list.append((org or default_org, repo))
+
+    return repo_list
+
+
+def print_repo_detail(client, org, repo):
+    '''
+    print views, clones, and referrer data for a single repo
+    :param client: GitClient used for API access
+    :param org: github org
+    :param repo: github repo
+    :return: None
+    '''
+
+    print(f'\npulling data for {org}/{repo}')
+    # get views and clones traffic stats
+    for type in ['views', 'clones']:
+        # get and output traffic data
+        print(f'\n  {type}')
+        repo_traffic = git_api_query_traffic(client, org, repo, type)
+        print(f"  14-day count: {repo_traffic['count']}")
+        print(f"  14-day unique: {repo_traffic['uniques']}")
+        print('  daily counts (date, count, unique)')
+        for item in repo_traffic[type]:
+            print(f"    {item['timestamp']}, {item['count']}, {item['uniques']}")
+
+    # get referrers traffic stats
+    print('\n  Top Referrers (referrer, count, unique')
+    repo_traffic = git_api_query_traffic(client, org, repo, 'popular/referrers')
+
+    for item in repo_traffic:
+        print(f"    {item['referrer']}, {item['count']}, {item['uniques']}")
+
+
+def repo_summary(client, org, repo):
+    '''
+    14 day views and clones totals and top referrer for a repo
+    :param client: GitClient used for API access
+    :param org: github org
+    :param repo: github repo
+    :return: summary dict, with an error message instead of stats if a query failed
+    '''
+
+    summary = {'repo': f'{org}/{repo}'}
+
+    try:
+        views = git_api_query_traffic(client, org, repo, 'views')
+        clones = git_api_query_traffic(client, org, repo, 'clones')
+        referrers = git_api_query_traffic(client, org, repo, 'popular/referrers')
+    except GitApiError as e:
+        summary['error'] = str(e).splitlines()[0]
+        return summary
+
+    summary['views'] = views['count']
+    summary['views_uniques'] = views['uniques']
+    summary['clones'] = clones['count']
+    summary['clones_uniques'] = clones['uniques']
+    # referrers are returned sorted by count
+    summary['top_referrer'] = f"{referrers[0]['referrer']} ({referrers[0]['count']})" if referrers else '-'
+
+    return summary
+
+
+def print_summary_table(summaries, sort):
+    '''
+    print one aligned row per repo sorted by the chosen column, repos with errors last
+    :param summaries: list of summary dicts
+    :param sort: summary key to sort by, counts sort highest first
+    :return: None
+    '''
+
+    ok = [summary for summary in summaries if 'error' not in summary]
+    failed = [summary for summary in summaries if 'error' in summary]
+    ok.sort(key=lambda summary: summary[sort], reverse=sort != 'repo')
+
+    rows = [[heading for heading, _ in TABLE_COLUMNS]]
+    rows.extend([str(summary[key]) for _, key in TABLE_COLUMNS] for summary in ok)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(TABLE_COLUMNS))]
+    widths[0] = max([widths[0]] + [len(summary['repo']) for summary in failed])
+
+    print()
+    for row in rows:
+        # repo and referrer names left aligned, counts right aligned
+        cells = [cell.ljust(width) if i in (0, len(row) - 1) else cell.rjust(width)
+                 for i, (cell, width) in enumerate(zip(row, widths))]
+        print('  '.join(cells).rstrip())
+
+    for summary in failed:
+        print(f"{summary['repo'].ljust(widths[0])}  error: {summary['error']}")
+
+
+@click.command()
+@click.argument("repos", nargs=-1)
+@click.option("-a", "--git_auth_token", help="git auth token", type=str, default='')
+@click.option("-o", "--org", help="github org", type=str, default='PaloAltoNetworks')
+@click.option("-r", "--repo", help="github repo, repeat for several repos", type=str, multiple=True)
+@click.option("-w", "--workers", help="number of repos to fetch concurrently", type=int, default=8)
+@click.option("-s", "--sort", help="summary table sort column",
+              type=click.Choice([key for _, key in TABLE_COLUMNS[:-1]]), default='views')
+@click.option("--cache_dir", help="api response cache directory", type=str, default=conf.cache_dir)
+@click.option("--no_cache", help="disable the api response cache", is_flag=True)
+def cli(repos, git_auth_token, org, repo, workers, sort, cache_dir, no_cache):
+    """
+    grab github traffic stats and output to screen
+    a single repo shows daily detail, several repos show a summary table
+    :param repos: org/repo or repo values, - reads them from stdin
+    :param git_token: personal auth token used for API access
+    :param org: github org
+    :param repo: github repos
+    :param workers: number of repos to fetch concurrently
+    :param sort: summary table sort column
+    :param cache_dir: directory for cached api responses
+    :param no_cache: send unconditional requests without the response cache
+    :return: None
+    """
+
+    repo_list = parse_repos(org, list(repo) + list(repos))
+    if not repo_list:
+        raise click.UsageError('no repos given, use -r or org/repo arguments')
+
+    cache = None if no_cache else ResponseCache(cache_dir)
+    client = GitClient(git_auth_token, pool_size=max(conf.github_pool_size, workers), cache=cache)
+    start_time = time.perf_counter()
+
+    try:
+        if len(repo_list) == 1:
+            print_repo_detail(client, *repo_list[0])
+        else:
+            with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+                summaries = list(executor.map(lambda org_repo: repo_summary(client, *org_repo), repo_list))
+            print_summary_table(summaries, sort)
+    except GitApiError as e:
+        print(e)
+        print('\nCorrect errors and rerun the application\n')
+        sys.exit()
+    finally:
+        client.close()
+
+    print(f'\n{len(repo_list)} repos in {time.perf_counter() - start_time:.2f} seconds')
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import threading
+import time
+
+from git_metrics import conf
+
+
+class TokenState:
+    '''
+    rate limit budget of one api resource for a single auth token as last reported by the api
+    '''
+
+    def __init__(self, token):
+        self.token = token
+        # budget is unknown until the first response comes back
+        self.limit = None
+        self.remaining = None
+        self.reset = 0.0
+        self.next_request = 0.0
+
+
+class RateLimitScheduler:
+    '''
+    pace requests across one or more auth tokens using the X-RateLimit headers on each response
+    tokens are used while they have budget left, then requests wait for the earliest reset
+    each api resource, such as core for rest requests and graphql, has its own budget per token
+    '''
+
+    def __init__(self, tokens, reserve=None, pacing_threshold=None):
+        '''
+        :param tokens: list of personal auth tokens to rotate across
+        :param reserve: requests held back per token, defaults to conf.github_rate_limit_reserve
+        :param pacing_threshold: fraction of the limit below which requests are spread out,
+            defaults to conf.github_rate_limit_pacing_threshold
+        '''
+
+        self.tokens = list(tokens)
+        # resource -> TokenState per token
+        self.resources = {}
+        # token -> Retry-After deadline, secondary rate limits hold back the token for every resource
+        self.blocked_until = {token: 0.0 for token in self.tokens}
+        self.reserve = conf.github_rate_limit_reserve if reserve is None else reserve
+        self.pacing_threshold = \
+            conf.github_rate_limit_pacing_threshold if pacing_threshold is None else pacing_threshold
+        self.lock = threading.Lock()
+
+    def ready_at(self, state, now):
+        '''
+        earliest time a token can send its next request
+        :param state: TokenState to check
+        :param now: current time
+        :return: epoch seconds when the token is usable
+        '''
+
+        ready = max(self.blocked_until[state.token], state.next_request)
+        if state.remaining is not None and state.remaining <= self.reserve and state.reset > now:
+            ready = max(ready, state.reset)
+
+        return ready
+
+    def states(self, resource):
+        '''
+        :param resource: api resource, as named in the X-RateLimit-Resource header
+        :return: list of TokenState for the resource, call with the lock held
+        '''
+
+        states = self.resources.get(resource)
+        if states is None:
+            states = self.resources[resource] = [TokenState(token) for token in self.tokens]
+
+        return states
+
+    def acquire(self, resource='core'):
+        '''
+        pick the token to use for the next request, sleeping until one has budget
+        :param resource: api resource the request counts against
+        :return: auth token
+        '''
+
+        while True:
+            with self.lock:
+                now = time.time()
+                # prefer the token that is ready soonest, then the one with the most budget left
+                state = min(self.states(resource), key=lambda s: (
+                    max(self.ready_at(s, now), now), -(s.remaining if s.remaining is not None else float('inf'))))
+                wait = self.ready_at(state, now) - now
+
+                if wait <= 0:
+                    if state.remaining is not None:
+                        # count the request now so concurrent workers see the in-flight budget
+                        state.remaining -= 1
+                        if state.limit and state.remaining < state.limit * self.pacing_threshold:
+                            spread = (state.reset - now) / max(state.remaining - self.reserve, 1)
+                            state.next_request = now + spread
+                    return state.token
+
+            if wait > 1:
+                print(f'rate limit reached, waiting {int(wait)} seconds')
+            time.sleep(wait)
+
+    def update(self, token, response):
+        '''
+        record the rate limit headers from a response
+        :param token: auth token the request was sent with
+        :param response: requests response
+        :return: None
+        '''
+
+        headers = response.headers
+        now = time.time()
+
+        with self.lock:
+            if 'X-RateLimit-Remaining' in headers:
+                resource = headers.get('X-RateLimit-Resource', 'core')
+                state = next(s for s in self.states(resource) if s.token == token)
+                state.remaining = int(headers['X-RateLimit-Remaining'])
+                state.reset = float(headers.get('X-RateLimit-Reset', 0))
+                if 'X-RateLimit-Limit' in headers:
+                    state.limit = int(headers['X-RateLimit-Limit'])
+
+            retry_after = headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                self.blocked_until[token] = max(self.blocked_until[token], now + int(retry_after))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+from git_metrics import conf
+from git_metrics.github_client import response_json
+
+# repos per page, the max the api allows
+PER_PAGE = 100
+
+
+def last_page(link_header):
+    '''
+    find the last page number from a paginated response Link header
+    <https://api.github.com/organizations/1/repos?per_page=100&page=5>; rel="last"
+    :param link_header: Link response header or None
+    :return: last page number, 1 if the response was not paginated
+    '''
+
+    for url, rel in re.findall(r'<([^>]+)>;\s*rel="(\w+)"', link_header or ''):
+        if rel == 'last':
+            return int(parse_qs(urlparse(url).query)['page'][0])
+
+    return 1
+
+
+def fetch_org_repos(client, org, workers):
+    '''
+    list all repos of an org, fetching the remaining pages concurrently once the last page is known
+    :param client: GitClient used for API access
+    :param org: github org name
+    :param workers: number of pages to fetch concurrently
+    :return: list of dicts with name, archived, fork, and visibility
+    '''
+
+    path = f'/orgs/{org}/repos'
+    first_page = client.get(path, params={'per_page': PER_PAGE, 'page': 1})
+    pages = [response_json(first_page)]
+
+    page_numbers = range(2, last_page(first_page.headers.get('Link')) + 1)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        pages.extend(executor.map(
+            lambda page: response_json(client.get(path, params={'per_page': PER_PAGE, 'page': page})), page_numbers))
+
+    return [
+        {'name': repo['name'], 'archived': repo['archived'], 'fork': repo['fork'],
+         'visibility': repo.get('visibility', 'private' if repo.get('private') else 'public')}
+        for page in pages for repo in page
+    ]
+
+
+def cached_org_repos(client, org, workers, cache_dir, ttl):
+    '''
+    list all repos of an org, reusing a cached list younger than ttl seconds
+    :param client: GitClient used for API access
+    :param org: github org name
+    :param workers: number of pages to fetch concurrently
+    :param cache_dir: directory for cached repo lists or None to always fetch
+    :param ttl: max age in seconds of a cached list
+    :return: list of dicts with name, archived, fork, and visibility
+    '''
+
+    if cache_dir is None:
+        return fetch_org_repos(client, org, workers)
+
+    cache_file = os.path.join(cache_dir, 'repo_lists', f'{org}.json')
+    try:
+        with open(cache_file) as f:
+            cached = json.load(f)
+        if time.time() - cached['fetched_at'] < ttl:
+            return cached['repos']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    repos = fetch_org_repos(client, org, workers)
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with open(f'{cache_file}.tmp', 'w') as f:
+        json.dump({'fetched_at': time.time(), 'repos': repos}, f)
+    os.replace(f'{cache_file}.tmp', cache_file)
+
+    return repos
+
+
+def discover_repos(client, orgs, workers=1, include_archived=False, include_forks=False, visibility='all',
+                   cache_dir=None, ttl=None):
+    '''
+    build the org and repo list for one or more orgs
+    :param client: GitClient used for API access
+    :param orgs: list of github org names
+    :param workers: number of pages to fetch concurrently
+    :param include_archived: keep archived repos
+    :param include_forks: keep forked repos
+    :param visibility: all, public, private, or internal
+    :param cache_dir: directory for cached repo lists or None to always fetch
+    :param ttl: max age in seconds of a cached list, defaults to conf.repo_list_ttl
+    :return: list of (org, repo) tuples sorted by repo name within each org
+    '''
+
+    ttl = conf.repo_list_ttl if ttl is None else ttl
+    repo_list = []
+
+    for org in orgs:
+        print(f'listing repos for {org}')
+        repos = cached_org_repos(client, org, workers, cache_dir, ttl)
+
+        for repo in sorted(repos, key=lambda r: r['name'].lower()):
+            if repo['archived'] and not include_archived:
+                continue
+            if repo['fork'] and not include_forks:
+                continue
+            if visibility != 'all' and repo['visibility'] != visibility:
+                continue
+            repo_list.append((org, repo['name']))
+
+    return repo_list
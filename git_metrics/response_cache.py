@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from git_metrics import conf
+
+
+def cache_key(path, params=None):
+    '''
+    build the cache key for an api request, e.g. /repos/{org}/{repo}/traffic/{type}
+    :param path: api path
+    :param params: optional query string parameters
+    :return: cache key string
+    '''
+
+    if not params:
+        return path
+
+    query = '&'.join(f'{k}={v}' for k, v in sorted(params.items()))
+    return f'{path}?{query}'
+
+
+class ResponseCache:
+    '''
+    size bounded LRU cache of api response bodies with their ETag and Last-Modified values
+    each entry is a json file in cache_dir, file mtime tracks last use across runs
+    '''
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        '''
+        :param cache_dir: directory holding cache entries, defaults to conf.cache_dir
+        :param max_bytes: max total size of cache entries, defaults to conf.cache_max_bytes
+        '''
+
+        self.cache_dir = conf.cache_dir if cache_dir is None else cache_dir
+        self.max_bytes = conf.cache_max_bytes if max_bytes is None else max_bytes
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # filename -> size, ordered least to most recently used
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        files = [e for e in os.scandir(self.cache_dir) if e.name.endswith('.json')]
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            self.entries[entry.name] = entry.stat().st_size
+            self.total_bytes += entry.stat().st_size
+
+    def filename(self, key):
+        return hashlib.sha1(key.encode()).hexdigest() + '.json'
+
+    def get(self, key):
+        '''
+        read a cache entry and mark it as recently used
+        :param key: cache key
+        :return: dict with etag, last_modified, and body or None if not cached
+        '''
+
+        name = self.filename(key)
+        path = os.path.join(self.cache_dir, name)
+
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        return entry
+
+    def put(self, key, etag, last_modified, body):
+        '''
+        store a response body, evicting least recently used entries past max_bytes
+        :param key: cache key
+        :param etag: ETag response header or None
+        :param last_modified: Last-Modified response header or None
+        :param body: parsed json response body
+        :return: None
+        '''
+
+        if etag is None and last_modified is None:
+            return
+
+        name = self.filename(key)
+        path = os.path.join(self.cache_dir, name)
+        data = json.dumps({'key': key, 'etag': etag, 'last_modified': last_modified, 'body': body})
+
+        # write to a temp file and rename so a concurrent reader never sees a partial entry
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(name, 0)
+            self.entries[name] = len(data)
+
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_name, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                try:
+                    os.remove(os.path.join(self.cache_dir, old_name))
+                except OSError:
+                    pass
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# percentiles reported for every timing
+QUANTILES = [0.5, 0.95, 0.99]
+
+
+def endpoint_name(path):
+    '''
+    api path with the org and repo names replaced so requests group by endpoint
+    :param path: api path such as /repos/{org}/{repo}/traffic/views
+    :return: endpoint name such as /repos/{org}/{repo}/traffic/views
+    '''
+
+    parts = path.strip('/').split('/')
+    if parts[0] == 'repos' and len(parts) >= 3:
+        return '/'.join(['', 'repos', '{org}', '{repo}'] + parts[3:])
+    if parts[0] == 'orgs' and len(parts) >= 2:
+        return '/'.join(['', 'orgs', '{org}'] + parts[2:])
+
+    return path
+
+
+def output_name(filename):
+    '''
+    :param filename: output file name such as daily_output/daily-{run date}.json
+    :return: file name without the directory and run date such as daily
+    '''
+
+    return os.path.basename(filename).split('-')[0]
+
+
+def percentile(sorted_values, quantile):
+    '''
+    nearest rank percentile
+    :param sorted_values: non empty list of values in ascending order
+    :param quantile: quantile between 0 and 1
+    :return: value at the quantile
+    '''
+
+    return sorted_values[max(math.ceil(quantile * len(sorted_values)) - 1, 0)]
+
+
+def label_key(labels):
+    '''
+    :param labels: dict of label names to values
+    :return: sorted tuple of label names and values as strings, so an int status and 'error' sort together
+    '''
+
+    return tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def label_text(labels):
+    '''
+    :param labels: tuple of (name, value) label pairs
+    :return: prometheus label set in braces, empty if there are no labels
+    '''
+
+    if not labels:
+        return ''
+
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class RunMetrics:
+    '''
+    timings and counters recorded during a collection run
+    timings keep every observation so exact percentiles can be reported at the end of the run
+    metrics are keyed by name and a sorted tuple of labels, recording is thread safe
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        clear all metrics and restart the run clock
+        :return: None
+        '''
+
+        with self.lock:
+            self.started = datetime.now()
+            self.start_time = time.perf_counter()
+            self.timings = {}
+            self.counters = {}
+
+    def observe(self, name, seconds, **labels):
+        '''
+        record one timing
+        :param name: timing name
+        :param seconds: elapsed seconds
+        :param labels: label values such as endpoint
+        :return: None
+        '''
+
+        key = (name, label_key(labels))
+        with self.lock:
+            self.timings.setdefault(key, []).append(seconds)
+
+    def increment(self, name, value=1, **labels):
+        '''
+        add to a counter
+        :param name: counter name
+        :param value: amount to add
+        :param labels: label values such as endpoint
+        :return: None
+        '''
+
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        '''
+        time the body of a with block
+        :param name: timing name
+        :param labels: label values
+        '''
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def summary(self):
+        '''
+        :return: dict of run wall time, timing percentiles, and counters
+        '''
+
+        with self.lock:
+            timings = {key: sorted(values) for key, values in self.timings.items()}
+            counters = dict(self.counters)
+
+        summary = {}
+        summary['started'] = self.started.isoformat(timespec='seconds')
+        summary['wall_seconds'] = round(time.perf_counter() - self.start_time, 3)
+
+        summary['timings'] = []
+        for (name, labels), values in sorted(timings.items()):
+            timing = {'name': name, 'labels': dict(labels), 'count': len(values), 'sum': round(sum(values), 6)}
+            for quantile in QUANTILES:
+                timing[f'p{int(quantile * 100)}'] = round(percentile(values, quantile), 6)
+            timing['max'] = round(values[-1], 6)
+            summary['timings'].append(timing)
+
+        summary['counters'] = [{'name': name, 'labels': dict(labels),
+                                'value': round(value, 6) if isinstance(value, float) else value}
+                               for (name, labels), value in sorted(counters.items())]
+
+        return summary
+
+    def prometheus_text(self, prefix='git_metrics'):
+        '''
+        format the run summary in the prometheus text exposition format
+        timings are written as summaries with quantile labels, counters get a _total suffix
+        :param prefix: metric name prefix
+        :return: prometheus text
+        '''
+
+        summary = self.summary()
+        lines = [f'# TYPE {prefix}_run_wall_seconds gauge', f'{prefix}_run_wall_seconds {summary["wall_seconds"]}']
+
+        typed = set()
+        for timing in summary['timings']:
+            name = f'{prefix}_{timing["name"]}'
+            labels = tuple(timing['labels'].items())
+            if name not in typed:
+                lines.append(f'# TYPE {name} summary')
+                typed.add(name)
+            for quantile in QUANTILES:
+                quantile_labels = label_text(labels + (('quantile', str(quantile)),))
+                lines.append(f'{name}{quantile_labels} {timing[f"p{int(quantile * 100)}"]}')
+            lines.append(f'{name}_sum{label_text(labels)} {timing["sum"]}')
+            lines.append(f'{name}_count{label_text(labels)} {timing["count"]}')
+
+        for counter in summary['counters']:
+            name = f'{prefix}_{counter["name"]}_total'
+            if name not in typed:
+                lines.append(f'# TYPE {name} counter')
+                typed.add(name)
+            lines.append(f'{name}{label_text(tuple(counter["labels"].items()))} {counter["value"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, filename):
+        '''
+        write the run summary as json
+        :param filename: output file name
+        :return: None
+        '''
+
+        write_atomic(filename, json.dumps(self.summary(), indent=2) + '\n')
+
+    def write_prometheus(self, filename):
+        '''
+        write the run summary for the node exporter textfile collector
+        :param filename: output file name, should end in .prom
+        :return: None
+        '''
+
+        write_atomic(filename, self.prometheus_text())
+
+
+def write_atomic(filename, text):
+    '''
+    write a file through a temp file so readers never see a partial file
+    :param filename: output file name
+    :param text: file contents
+    :return: None
+    '''
+
+    if os.path.dirname(filename):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(f'{filename}.tmp', 'w') as f:
+        f.write(text)
+    os.replace(f'{filename}.tmp', filename)
+
+
+# metrics of the current run, shared by the api client, the row pipeline, and the writers
+run_metrics = RunMetrics()
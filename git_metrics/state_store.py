@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# Copyright (c) 2018, Palo Alto Networks
+#
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+#
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+# Authors: Scott Shoaf
+
+import os
+import sqlite3
+
+from git_metrics import conf
+
+
+class StateStore:
+    '''
+    sqlite store of the last fully collected day for each org/repo
+    used so each run only emits days that earlier runs have not already written
+    also keeps the daemon's refresh schedule so a restarted daemon picks up where it stopped
+    '''
+
+    def __init__(self, db_path=None):
+        '''
+        :param db_path: sqlite database file, defaults to conf.state_db
+        '''
+
+        db_path = conf.state_db if db_path is None else db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self.db = sqlite3.connect(db_path)
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS collection_state (
+                org TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                last_day TEXT NOT NULL,
+                PRIMARY KEY (org, repo)
+            )''')
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS refresh_schedule (
+                org TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                next_refresh REAL NOT NULL,
+                PRIMARY KEY (org, repo)
+            )''')
+        # checkpoints of json runs, a run is complete once every repo was collected
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                started TEXT NOT NULL,
+                days_ago INTEGER NOT NULL,
+                full INTEGER NOT NULL,
+                daily_offset INTEGER NOT NULL DEFAULT 0,
+                referrer_offset INTEGER NOT NULL DEFAULT 0,
+                parts INTEGER NOT NULL DEFAULT 0,
+                complete INTEGER NOT NULL DEFAULT 0
+            )''')
+        # repos checkpointed by a run, error is set for repos that failed
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS run_repos (
+                run_id TEXT NOT NULL,
+                org TEXT NOT NULL,
+                repo TEXT NOT NULL,
+                last_day TEXT,
+                error TEXT,
+                PRIMARY KEY (run_id, org, repo)
+            )''')
+        self.db.commit()
+
+    def last_days(self):
+        '''
+        :return: dict of (org, repo) to the last collected day as YYYY-MM-DD
+        '''
+
+        rows = self.db.execute('SELECT org, repo, last_day FROM collection_state')
+        return {(org, repo): last_day for org, repo, last_day in rows}
+
+    def set_last_days(self, last_days):
+        '''
+        record the last collected day for several repos in one transaction
+        :param last_days: dict of (org, repo) to YYYY-MM-DD
+        :return: None
+        '''
+
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO collection_state (org, repo, last_day) VALUES (?, ?, ?) '
+                'ON CONFLICT (org, repo) DO UPDATE SET last_day = excluded.last_day '
+                'WHERE excluded.last_day > collection_state.last_day',
+                [(org, repo, last_day) for (org, repo), last_day in last_days.items()])
+
+    def next_refreshes(self):
+        '''
+        :return: dict of (org, repo) to the unix time the daemon next refreshes it
+        '''
+
+        rows = self.db.execute('SELECT org, repo, next_refresh FROM refresh_schedule')
+        return {(org, repo): next_refresh for org, repo, next_refresh in rows}
+
+    def set_next_refreshes(self, next_refreshes):
+        '''
+        record the next refresh time for several repos in one transaction
+        :param next_refreshes: dict of (org, repo) to unix time
+        :return: None
+        '''
+
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO refresh_schedule (org, repo, next_refresh) VALUES (?, ?, ?) '
+                'ON CONFLICT (org, repo) DO UPDATE SET next_refresh = excluded.next_refresh',
+                [(org, repo, next_refresh) for (org, repo), next_refresh in next_refreshes.items()])
+
+    def start_run(self, run_id, started, days_ago, full):
+        '''
+        record a new json run
+        :param run_id: run date used in the output file names
+        :param started: isoformat datetime the run collects up to
+        :param days_ago: look back num days of the run
+        :param full: the run ignores the last collected days
+        :return: None
+        '''
+
+        with self.db:
+            self.db.execute('INSERT INTO runs (run_id, started, days_ago, full) VALUES (?, ?, ?, ?)',
+                            (run_id, started, days_ago, int(full)))
+
+    def incomplete_run(self):
+        '''
+        :return: dict of the latest run that was interrupted or had failed repos, None if there is none
+        '''
+
+        self.db.row_factory = sqlite3.Row
+        try:
+            row = self.db.execute('SELECT * FROM runs WHERE complete = 0 ORDER BY run_id DESC LIMIT 1').fetchone()
+        finally:
+            self.db.row_factory = None
+
+        return None if row is None else dict(row)
+
+    def run_repos(self, run_id):
+        '''
+        :param run_id: run date
+        :return: tuple of (dict of collected (org, repo) to last collected day, dict of failed (org, repo) to error)
+        '''
+
+        collected = {}
+        failed = {}
+        for org, repo, last_day, error in self.db.execute(
+                'SELECT org, repo, last_day, error FROM run_repos WHERE run_id = ?', (run_id,)):
+            if error is None:
+                collected[(org, repo)] = last_day
+            else:
+                failed[(org, repo)] = error
+
+        return collected, failed
+
+    def checkpoint(self, run_id, daily_offset, referrer_offset, parts, collected, failed):
+        '''
+        record the repos finished since the last checkpoint and the output offsets after them
+        in one transaction, so a resumed run never skips a repo whose output was not kept
+        :param run_id: run date
+        :param daily_offset: daily output file offset
+        :param referrer_offset: referrer output file offset
+        :param parts: number of parquet parts written
+        :param collected: dict of (org, repo) to last collected day or None
+        :param failed: dict of (org, repo) to error
+        :return: None
+        '''
+
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO run_repos (run_id, org, repo, last_day, error) VALUES (?, ?, ?, ?, ?)',
+                [(run_id, org, repo, last_day, None) for (org, repo), last_day in collected.items()]
+                + [(run_id, org, repo, None, error) for (org, repo), error in failed.items()])
+            self.db.execute('UPDATE runs SET daily_offset = ?, referrer_offset = ?, parts = ? WHERE run_id = ?',
+                            (daily_offset, referrer_offset, parts, run_id))
+
+    def finish_run(self, run_id):
+        '''
+        mark a run complete so it is no longer resumed
+        :param run_id: run date
+        :return: None
+        '''
+
+        with self.db:
+            self.db.execute('UPDATE runs SET complete = 1 WHERE run_id = ?', (run_id,))
+
+    def close(self):
+        self.db.close()